@@ -4,19 +4,108 @@
 # pylint: disable=C0111,C0413,W0401
 """Miscellaneous functions."""
 # Standard library imports
+import importlib
 import sys
 
 # Intra-package imports
 from .pkgdata import __version__
-from .ctx import *
-from .dicts import *
-from .file import *
-from .member import *
-from .misc import *
-from .number import *
-from .rst import *
-from .strings import *
-from .test import *
-from .test import _excepthook
+
+
+###
+# Global variables
+###
+# Public API name -> sub-module that defines it. Sub-modules are imported on
+# first attribute access so that, for example, using pmisc.CiDict does not
+# pull in Pytest via the pmisc.test module
+_API = {
+    "benchmark": ["BenchResult", "bench"],
+    "ctx": [
+        "deadline",
+        "ignored",
+        "timed",
+        "Timer",
+        "TmpDir",
+        "TmpDirPool",
+        "TmpFile",
+        "TmpFiles",
+    ],
+    "dicts": ["CiDict"],
+    "export": [
+        "Exporter",
+        "JsonLinesExporter",
+        "PrometheusExporter",
+        "StatsdExporter",
+    ],
+    "file": ["make_dir", "normalize_windows_fname"],
+    "member": ["isalpha", "ishex", "isiterable", "isnumber", "isreal"],
+    "misc": ["flatten_list"],
+    "number": ["gcd", "normalize", "per", "pgcd"],
+    "prof": ["MemTrace", "Profile", "ResourceUsage", "SampleProfiler"],
+    "rst": ["LDELIM", "RDELIM", "incfile", "ste", "term_echo"],
+    "stats": ["Histogram", "TimerRegistry", "timer_registry"],
+    "strings": [
+        "binary_string_to_octal_string",
+        "char_to_decimal",
+        "elapsed_time_string",
+        "pcolor",
+        "quote_str",
+        "strframe",
+    ],
+    "test": [
+        "assert_arg_invalid",
+        "assert_exception",
+        "assert_prop",
+        "assert_ro_prop",
+        "compare_strings",
+        "comp_list_of_dicts",
+        "exception_type_str",
+        "get_exmsg",
+    ],
+    "tracing": ["TraceRecorder"],
+}
+_LAZY_ATTRS = dict((name, mname) for mname, names in _API.items() for name in names)
+__all__ = sorted(_LAZY_ATTRS)
+
+
+###
+# Functions
+###
+def _excepthook(exc_type, exc_value, exc_traceback):
+    """
+    Shorten tracebacks of exceptions raised by the pmisc.test module functions.
+
+    Unless the pmisc.test module has been imported there can be no frames of
+    it in the traceback, so the original exception hook is used directly
+    """
+    if __name__ + ".test" not in sys.modules:
+        sys.__excepthook__(exc_type, exc_value, exc_traceback)
+        return
+    sys.modules[__name__ + ".test"]._excepthook(exc_type, exc_value, exc_traceback)
+
+
+if sys.hexversion < 0x03070000:  # pragma: no cover
+    # Module-level __getattr__ (PEP 562) is not available, import eagerly
+    for _mname in _API:
+        _MOBJ = importlib.import_module("." + _mname, __name__)
+        globals().update((_name, getattr(_MOBJ, _name)) for _name in _API[_mname])
+else:
+
+    def __getattr__(name):
+        """Import sub-module that defines the requested attribute on first access."""
+        if name in _API:
+            return importlib.import_module("." + name, __name__)
+        if name not in _LAZY_ATTRS:
+            raise AttributeError(
+                "module {0!r} has no attribute {1!r}".format(__name__, name)
+            )
+        mobj = importlib.import_module("." + _LAZY_ATTRS[name], __name__)
+        value = getattr(mobj, name)
+        globals()[name] = value
+        return value
+
+    def __dir__():
+        """List module attributes, including not-yet-imported public API."""
+        return sorted(set(globals()) | set(_LAZY_ATTRS) | set(_API))
+
 
 sys.excepthook = _excepthook
@@ -0,0 +1,259 @@
+# benchmark.py
+# Copyright (c) 2013-2020 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111,R0205,R0902,R0903,R0913
+
+# Standard library imports
+import gc
+import itertools
+import math
+
+# Intra-package imports
+from .ctx import Timer, _calibrate
+
+
+###
+# Functions
+###
+def _percentile(data, prob):
+    """Return percentile of sorted data, linearly interpolating between points."""
+    pos = prob * (len(data) - 1)
+    low = int(math.floor(pos))
+    high = min(low + 1, len(data) - 1)
+    return data[low] + (data[high] - data[low]) * (pos - low)
+
+
+def _run(func, args, kwargs, loops):
+    """Call a function a number of times, return elapsed time in nanoseconds."""
+    with Timer() as tobj:
+        for _ in itertools.repeat(None, loops):
+            func(*args, **kwargs)
+    return tobj.elapsed_ns
+
+
+###
+# Classes
+###
+class BenchResult(object):
+    """
+    Micro-benchmark result.
+
+    All times are per call of the benchmarked function and in seconds
+    """
+
+    def __init__(self, timings, loops, overhead):  # noqa
+        self._timings = tuple(timings)
+        self._loops = loops
+        self._overhead = overhead
+        data = sorted(self._timings)
+        num = len(data)
+        self._median = _percentile(data, 0.5)
+        qlow, qhigh = _percentile(data, 0.25), _percentile(data, 0.75)
+        self._iqr = qhigh - qlow
+        self._outliers = len(
+            [
+                item
+                for item in data
+                if (item < qlow - 1.5 * self._iqr) or (item > qhigh + 1.5 * self._iqr)
+            ]
+        )
+        # Distribution-free 95% confidence interval of the median, from the
+        # order statistics given by the normal approximation to the binomial
+        # distribution
+        delta = 1.96 * math.sqrt(num) / 2.0
+        self._conf_int = (
+            data[max(0, int(math.floor(num / 2.0 - delta)))],
+            data[min(num - 1, int(math.ceil(num / 2.0 + delta)) - 1)],
+        )
+
+    def __repr__(self):  # noqa
+        return (
+            "BenchResult(median={0:.6g}, iqr={1:.6g}, conf_int=({2:.6g}, {3:.6g}), "
+            "ops={4:.6g}, loops={5}, repeat={6})".format(
+                self._median,
+                self._iqr,
+                self._conf_int[0],
+                self._conf_int[1],
+                self.ops,
+                self._loops,
+                len(self._timings),
+            )
+        )
+
+    def _get_conf_int(self):
+        return self._conf_int
+
+    def _get_iqr(self):
+        return self._iqr
+
+    def _get_loops(self):
+        return self._loops
+
+    def _get_median(self):
+        return self._median
+
+    def _get_ops(self):
+        return 1.0 / self._median if self._median > 0 else float("inf")
+
+    def _get_outliers(self):
+        return self._outliers
+
+    def _get_overhead(self):
+        return self._overhead
+
+    def _get_timings(self):
+        return self._timings
+
+    conf_int = property(_get_conf_int, doc="Median confidence interval")
+    """
+    Returns the 95% confidence interval of the median, as a (lower bound,
+    upper bound) tuple
+
+    :rtype: tuple
+    """
+
+    iqr = property(_get_iqr, doc="Interquartile range")
+    """
+    Returns the interquartile range of the timings
+
+    :rtype: float
+    """
+
+    loops = property(_get_loops, doc="Calls per repetition")
+    """
+    Returns the number of times the function is called in each repetition
+
+    :rtype: integer
+    """
+
+    median = property(_get_median, doc="Median")
+    """
+    Returns the median of the timings
+
+    :rtype: float
+    """
+
+    ops = property(_get_ops, doc="Operations per second")
+    """
+    Returns the number of calls per second, based on the median
+
+    :rtype: float
+    """
+
+    outliers = property(_get_outliers, doc="Number of outliers")
+    """
+    Returns the number of timings outside the [Q1 - 1.5 IQR, Q3 + 1.5 IQR]
+    range, where Q1 and Q3 are the first and third quartiles and IQR is the
+    interquartile range
+
+    :rtype: integer
+    """
+
+    overhead = property(_get_overhead, doc="Timer overhead")
+    """
+    Returns the measured overhead of a :py:class:`pmisc.Timer` block that was
+    subtracted from each repetition, in seconds per repetition
+
+    :rtype: float
+    """
+
+    timings = property(_get_timings, doc="Timings")
+    """
+    Returns the time per call of each repetition
+
+    :rtype: tuple of floats
+    """
+
+
+def bench(func, *args, target=0.1, repeat=15, warmup=1, disable_gc=False, **kwargs):
+    r"""
+    Micro-benchmark a function.
+
+    The number of calls per repetition is calibrated so that each repetition
+    takes at least **target** seconds. The function is then run for
+    **warmup** repetitions, whose timings are discarded, followed by
+    **repeat** measured repetitions. The overhead of the
+    :py:class:`pmisc.Timer` context manager used to time each repetition
+    (see :py:attr:`pmisc.Timer.overhead_ns`) is subtracted
+
+    :param func: Function to benchmark
+    :type  func: callable
+
+    :param args: Positional arguments for function
+    :type  args: any
+
+    :param target: Minimum duration of each repetition, in seconds
+    :type  target: positive float
+
+    :param repeat: Number of measured repetitions
+    :type  repeat: positive integer
+
+    :param warmup: Number of repetitions run, and discarded, before the
+                   measured repetitions
+    :type  warmup: non-negative integer
+
+    :param disable_gc: Flag that indicates whether the garbage collector is
+                       disabled during the measurements (True) or not (False)
+    :type  disable_gc: boolean
+
+    :param kwargs: Keyword arguments for function. Use
+                   :py:func:`functools.partial` to pass keyword arguments
+                   with the same name as the arguments of this function
+    :type  kwargs: any
+
+    :rtype: :py:class:`pmisc.BenchResult`
+
+    :raises RuntimeError: Argument \`disable_gc\` is not valid
+    :raises RuntimeError: Argument \`func\` is not valid
+    :raises RuntimeError: Argument \`repeat\` is not valid
+    :raises RuntimeError: Argument \`target\` is not valid
+    :raises RuntimeError: Argument \`warmup\` is not valid
+
+    For example:
+
+        >>> import pmisc
+        >>> result = pmisc.bench(sorted, [3, 2, 1], target=0.001, repeat=5)
+        >>> result.median > 0
+        True
+    """
+    # pylint: disable=R0914
+    if not callable(func):
+        raise RuntimeError("Argument `func` is not valid")
+    if (
+        isinstance(target, bool)
+        or (not isinstance(target, (int, float)))
+        or (target <= 0)
+    ):
+        raise RuntimeError("Argument `target` is not valid")
+    if isinstance(repeat, bool) or (not isinstance(repeat, int)) or (repeat < 1):
+        raise RuntimeError("Argument `repeat` is not valid")
+    if isinstance(warmup, bool) or (not isinstance(warmup, int)) or (warmup < 0):
+        raise RuntimeError("Argument `warmup` is not valid")
+    if not isinstance(disable_gc, bool):
+        raise RuntimeError("Argument `disable_gc` is not valid")
+    gc_enabled = gc.isenabled()
+    if disable_gc:
+        gc.disable()
+    try:
+        overhead = _calibrate("wall")[0]
+        # Calibrate number of calls per repetition, akin to
+        # timeit.Timer.autorange
+        target_ns = 1e9 * target
+        loops = 1
+        while True:
+            elapsed = _run(func, args, kwargs, loops)
+            if elapsed >= target_ns:
+                break
+            loops = max(
+                2 * loops, int(math.ceil(1.1 * loops * target_ns / max(elapsed, 1)))
+            )
+        for _ in range(warmup):
+            _run(func, args, kwargs, loops)
+        timings = [
+            max(0, _run(func, args, kwargs, loops) - overhead) / (1e9 * loops)
+            for _ in range(repeat)
+        ]
+    finally:
+        if disable_gc and gc_enabled:
+            gc.enable()
+    return BenchResult(timings, loops, overhead / 1e9)
@@ -5,20 +5,552 @@
 
 # Standard library imports
 from __future__ import print_function
+import atexit
+import collections
+import errno
+import functools
+import gc
+import heapq
+import inspect
+import itertools
+import math
+import mmap
 import os
 import platform
+import queue
+import random
 import shutil
+import signal
+import sys
 import tempfile
+import threading
 import time
-import types
+import traceback
+import weakref
+
+try:  # pragma: no cover
+    import contextvars
+except ImportError:  # pragma: no cover
+    contextvars = None
+try:  # pragma: no cover
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
 
 # PyPI imports
 import decorator
 
+# Intra-package imports
+from .stats import Histogram, _ThreadVar, _pop_timer, _push_timer, timer_registry
+from .tracing import _RECORDER, _TRACE_IDS
+
 if os.environ.get("APPVEYOR", None):  # pragma: no cover
     tempfile.tempdir = os.environ["CITMP"]
 
 
+###
+# Functions
+###
+def _ns_clock(name):
+    """Return nanosecond version of a clock from the time module, if available."""
+    if hasattr(time, name + "_ns"):
+        return getattr(time, name + "_ns")
+    if hasattr(time, name):  # pragma: no cover
+        func = getattr(time, name)
+        return lambda: int(func() * 1e9)
+    return None  # pragma: no cover
+
+
+def _allocate(fdesc, size):
+    """Preallocate file storage, only set the file size if not supported."""
+    if hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(fdesc, 0, size)
+            return
+        except OSError as exc:  # pragma: no cover
+            if exc.errno not in [errno.EINVAL, errno.EOPNOTSUPP]:
+                raise
+    os.ftruncate(fdesc, size)  # pragma: no cover
+
+
+def _bad_contents(contents, binary):
+    """Test if temporary file contents are not valid for the file mode."""
+    scalar, other = (_BYTES_LIKE, str) if binary else (str, _BYTES_LIKE)
+    return isinstance(contents, other) or (
+        (not isinstance(contents, scalar)) and (not hasattr(contents, "__iter__"))
+    )
+
+
+def _calibrate(clock):
+    """
+    Return empty Timer block overhead and clock resolution, in nanoseconds.
+
+    Computed once per process and clock. The overhead is the median of the
+    median lap times of several rounds of empty blocks, the resolution is the
+    smallest observed clock increment
+    """
+    ret = _CALIBRATION.get(clock)
+    if ret is None:
+        func = _CLOCKS[clock]
+        increments = []
+        for _ in range(5):
+            tstart = func()
+            tick = func()
+            while tick == tstart:
+                tick = func()
+            tnext = func()
+            while tnext == tick:
+                tnext = func()
+            increments.append(tnext - tick)
+        tobj = Timer(clock=clock, keep_laps=101)
+        medians = []
+        for _ in range(11):
+            for _ in itertools.repeat(None, 101):
+                with tobj:
+                    pass
+            medians.append(sorted(tobj.laps)[50])
+            tobj.reset()
+        ret = _CALIBRATION[clock] = (sorted(medians)[5], min(increments))
+    return ret
+
+
+def _clone_file(src, dst, strategy, failed):
+    """Populate a file from a template file, return strategy used."""
+    chain = _STRATEGIES[_STRATEGIES.index(strategy) :]
+    if ("hardlink" in chain) and ("hardlink" not in failed):
+        try:
+            os.link(src, dst)
+            return "hardlink"
+        except OSError:
+            failed.add("hardlink")
+    with open(src, "rb", buffering=0) as fsrc, open(dst, "xb", buffering=0) as fdst:
+        if (
+            ("reflink" in chain)
+            and ("reflink" not in failed)
+            and (fcntl is not None)
+            and (_FICLONE is not None)
+        ):
+            try:
+                fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+                used = "reflink"
+            except OSError:
+                failed.add("reflink")
+                used = "copy"
+        else:
+            used = "copy"
+        if used == "copy":
+            if hasattr(os, "copy_file_range") and ("copy_file_range" not in failed):
+                try:
+                    while os.copy_file_range(fsrc.fileno(), fdst.fileno(), 1 << 30):
+                        pass
+                except OSError:
+                    failed.add("copy_file_range")
+            # Copy what copy_file_range did not, if anything
+            shutil.copyfileobj(fsrc, fdst, 1 << 20)
+    shutil.copymode(src, dst)
+    return used
+
+
+def _clone_tree(src, dst, files):
+    """Create directories and symbolic links of a tree, list its files."""
+    for entry in os.scandir(src):
+        target = os.path.join(dst, entry.name)
+        if entry.is_symlink():
+            os.symlink(os.readlink(entry.path), target)
+        elif entry.is_dir():
+            os.mkdir(target)
+            _clone_tree(entry.path, target, files)
+        elif entry.is_file(follow_symlinks=False):
+            files.append((entry.path, target))
+        else:
+            # Reading a FIFO or a device could block or never end
+            raise shutil.SpecialFileError(
+                "`{0}` is not a regular file".format(entry.path)
+            )
+
+
+def _cleanup_after_fork():
+    """
+    Discard the cleanup thread state inherited by a forked child process.
+
+    The thread does not exist in the child, which gets its own lock, queue
+    and thread when it first needs them. Removals queued by the parent are
+    left to the parent
+    """
+    global _CLEANUP_LOCK, _CLEANUP_QUEUE  # pylint: disable=W0603
+    _CLEANUP_LOCK = threading.Lock()
+    _CLEANUP_QUEUE = queue.Queue(_CLEANUP_MAX)
+    _CLEANUP_THREAD[0] = None
+
+
+def _cleanup_worker():
+    """Remove queued temporary files and directories."""
+    while True:
+        path = _CLEANUP_QUEUE.get()
+        try:
+            _remove_path(path)
+        finally:
+            _CLEANUP_QUEUE.task_done()
+
+
+def _defer_removal(path, tombstone):
+    """
+    Queue a temporary file or directory for removal by the cleanup thread.
+
+    The path is renamed first, if requested, so that it is free as soon as
+    the function returns. The path is removed in the calling thread if the
+    queue is full
+    """
+    if tombstone:
+        tpath = "{0}.deleted-{1}".format(path, next(_CLEANUP_SEQ))
+        try:
+            os.rename(path, tpath)
+            path = tpath
+        except OSError:
+            pass
+    with _CLEANUP_LOCK:
+        if _CLEANUP_THREAD[0] is None:
+            _CLEANUP_THREAD[0] = threading.Thread(
+                target=_cleanup_worker, name="pmisc-cleanup"
+            )
+            _CLEANUP_THREAD[0].daemon = True
+            _CLEANUP_THREAD[0].start()
+            atexit.register(_drain_cleanup)
+    try:
+        _CLEANUP_QUEUE.put_nowait(path)
+    except queue.Full:
+        _remove_path(path)
+
+
+def _drain_cleanup():
+    """Wait until all queued temporary files and directories are removed."""
+    if _CLEANUP_THREAD[0] is not None:
+        _CLEANUP_QUEUE.join()
+
+
+def _empty_dir(dname):
+    """Remove the contents of a directory, keeping the directory itself."""
+    for entry in os.scandir(dname):
+        if entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(entry.path)
+        else:
+            os.unlink(entry.path)
+
+
+def _gc_attach(obj):
+    """Start reporting garbage collections to a timer."""
+    global _GC_TIMERS  # pylint: disable=W0603
+    with _GC_LOCK:
+        if not _GC_TIMERS:
+            gc.callbacks.append(_gc_callback)
+        _GC_TIMERS = _GC_TIMERS + (obj,)
+
+
+def _gc_callback(phase, info):
+    """Measure garbage collection pauses and report them to active timers."""
+    # pylint: disable=W0212
+    if phase == "start":
+        _GC_START[0] = _CLOCKS["wall"]()
+        return
+    if _GC_START[0] is None:  # pragma: no cover
+        return
+    pause = _CLOCKS["wall"]() - _GC_START[0]
+    _GC_START[0] = None
+    gen = info["generation"]
+    for obj in _GC_TIMERS:
+        obj._gc_pause_ns += pause
+        obj._gc_generations[gen] += 1
+
+
+def _gc_detach(obj):
+    """Stop reporting garbage collections to a timer."""
+    global _GC_TIMERS  # pylint: disable=W0603
+    with _GC_LOCK:
+        timers = list(_GC_TIMERS)
+        timers.remove(obj)
+        _GC_TIMERS = tuple(timers)
+        if not _GC_TIMERS:
+            gc.callbacks.remove(_gc_callback)
+
+
+def _remove_dirs(dnames):
+    """Remove directories (and their contents), ignoring errors."""
+    while dnames:
+        shutil.rmtree(dnames.pop(), ignore_errors=True)
+
+
+def _remove_path(path):
+    """Remove a file or a directory tree, ignoring errors."""
+    if os.path.isdir(path) and (not os.path.islink(path)):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        with ignored(OSError):
+            os.remove(path)
+
+
+def _shm_dir():
+    """Return the shared memory file system directory, if usable."""
+    try:
+        stat = os.statvfs(_SHM_DIR)
+    except (AttributeError, OSError):
+        return None
+    if (stat.f_bavail * stat.f_frsize < _SHM_MIN_FREE) or (
+        not os.access(_SHM_DIR, os.W_OK | os.X_OK)
+    ):
+        return None
+    return _SHM_DIR
+
+
+def _watchdog():
+    """Fire callbacks of active deadlines that are due."""
+    # pylint: disable=W0212
+    while True:
+        with _WATCHDOG:
+            while True:
+                while _WATCHDOG_HEAP and (not _WATCHDOG_HEAP[0][3]):
+                    heapq.heappop(_WATCHDOG_HEAP)
+                now = _CLOCKS["wall"]()
+                if _WATCHDOG_HEAP and (_WATCHDOG_HEAP[0][0] <= now):
+                    entry = heapq.heappop(_WATCHDOG_HEAP)
+                    break
+                _WATCHDOG.wait(
+                    (_WATCHDOG_HEAP[0][0] - now) / 1e9 if _WATCHDOG_HEAP else None
+                )
+        entry[2]._fire(entry)
+
+
+def _watchdog_after_fork():
+    """
+    Discard the deadline watchdog thread state inherited by a forked child.
+
+    The thread does not exist in the child, which starts its own thread when
+    it first needs one
+    """
+    global _WATCHDOG, _WATCHDOG_HEAP  # pylint: disable=W0603
+    _WATCHDOG = threading.Condition()
+    _WATCHDOG_HEAP = []
+    _WATCHDOG_THREAD[0] = None
+
+
+def _write_contents(fobj, contents):
+    """Write a string, a bytes-like object or an iterable of them to a file."""
+    if isinstance(contents, (str,) + _BYTES_LIKE):
+        fobj.write(contents)
+    elif contents is not None:
+        for chunk in contents:
+            fobj.write(chunk)
+
+
+def timed(name=None, sample=1.0, registry=None):
+    r"""
+    Time calls of a function, optionally sampling them.
+
+    Each measured call is recorded in a timer registry like a lap of a named
+    :py:class:`pmisc.Timer` object (see :py:class:`pmisc.TimerRegistry`),
+    without creating a timer object per call. Coroutine functions are
+    supported. When **sample** is less than one only that fraction of the
+    calls, chosen at random, is measured; the cost of a call that is not
+    measured is a counter decrement. Sampled measurements are recorded with
+    a weight equal to the inverse of **sample**, so the counts and totals of
+    the registry statistics are estimates of those of all calls, while the
+    mean and percentiles are those of the sampled calls. Named timers used
+    in calls that are not measured are recorded under the caller call tree
+    path
+
+    :param name: Timer name. If None the qualified name of the function is
+                 used
+    :type  name: string or None
+
+    :param sample: Fraction of the calls that are measured, for example
+                   :code:`1/100` to measure one call in a hundred on average
+    :type  sample: float in the (0, 1] range
+
+    :param registry: Timer registry to record measurements in. If None the
+                     default registry (:py:func:`pmisc.timer_registry`) is
+                     used
+    :type  registry: :py:class:`pmisc.TimerRegistry` or None
+
+    :raises RuntimeError: Argument \`name\` is not valid
+    :raises RuntimeError: Argument \`sample\` is not valid
+
+    For example:
+
+        >>> import pmisc
+        >>> registry = pmisc.TimerRegistry()
+        >>> @pmisc.timed("square", sample=1/10, registry=registry)
+        ... def square(num):
+        ...     return num * num
+        >>> sum(square(num) for num in range(1000))
+        332833500
+        >>> registry.stats()[("square",)]["count"] % 10
+        0
+    """
+    # pylint: disable=W0212
+    if (name is not None) and ((not isinstance(name, str)) or (not name)):
+        raise RuntimeError("Argument `name` is not valid")
+    if (
+        isinstance(sample, bool)
+        or (not isinstance(sample, (int, float)))
+        or (not 0 < sample <= 1)
+    ):
+        raise RuntimeError("Argument `sample` is not valid")
+    weight = 1.0 / sample
+    if abs(weight - round(weight)) < 1e-9:
+        weight = int(round(weight))
+    log_skip = math.log(1.0 - sample) if sample < 1 else None
+    clock = _CLOCKS["wall"]
+
+    def gap():
+        """Return number of calls until the next sampled call (geometric)."""
+        return int(math.log(1.0 - random.random()) / log_skip) + 1
+
+    def wrap(func):
+        tname = name or func.__qualname__
+
+        def begin(aid):
+            path, token = _push_timer(tname)
+            rec = _RECORDER[0]
+            if rec is not None:
+                rec._add(
+                    "B" if aid is None else "b", tname, {"path": "/".join(path)}, aid
+                )
+            return path, token, rec, clock()
+
+        def end(state, aid):
+            lap = clock() - state[3]
+            path, token, rec, _ = state
+            _pop_timer(token)
+            if rec is not None:
+                rec._add("E" if aid is None else "e", tname, None, aid)
+            (registry or timer_registry()).record(path, lap, weight)
+
+        if inspect.iscoroutinefunction(func):
+
+            async def measured(args, kwargs):
+                aid = next(_TRACE_IDS)
+                state = begin(aid)
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    end(state, aid)
+
+        else:
+
+            def measured(args, kwargs):
+                state = begin(None)
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    end(state, None)
+
+        # The wrapper returns the coroutine of coroutine functions (measured
+        # or not) without awaiting it, so it works for both kinds of functions
+        if log_skip is None:
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                return measured(args, kwargs)
+
+        else:
+            countdown = [gap()]
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                countdown[0] -= 1
+                if countdown[0] > 0:
+                    return func(*args, **kwargs)
+                countdown[0] = gap()
+                return measured(args, kwargs)
+
+        return wrapper
+
+    return wrap
+
+
+###
+# Helper classes
+###
+class _Lap(object):
+    """State of a timer lap in progress in a thread or asynchronous task."""
+
+    __slots__ = [
+        "timer",
+        "parent",
+        "token",
+        "tstart",
+        "cpu_start",
+        "path",
+        "path_token",
+        "trace",
+        "trace_id",
+    ]
+
+    def __init__(self, timer, parent, cpu_start, trace_id):
+        self.timer = timer
+        self.parent = parent
+        self.token = None
+        self.tstart = None
+        self.cpu_start = cpu_start
+        self.path = None
+        self.path_token = None
+        self.trace = None
+        self.trace_id = trace_id
+
+
+###
+# Global variables
+###
+_CLOCKS = dict(
+    (name, _ns_clock(func))
+    for name, func in [
+        ("wall", "perf_counter"),
+        ("process", "process_time"),
+        ("thread", "thread_time"),
+    ]
+    if _ns_clock(func)
+)
+_CPU_CLOCK = _CLOCKS.get("thread", _CLOCKS["process"])
+# Innermost timer lap in progress in the current thread or asynchronous task,
+# outer laps are linked through the parent attribute
+_TIMER_LAP = (contextvars.ContextVar if contextvars else _ThreadVar)(
+    "pmisc_timer_lap", default=None
+)
+# Empty Timer block overhead and resolution of each clock, see _calibrate
+_CALIBRATION = {}
+# Temporary files and directories pending removal by the cleanup thread,
+# at most _CLEANUP_MAX; when the queue is full they are removed synchronously
+_CLEANUP_MAX = 64
+_CLEANUP_LOCK = threading.Lock()
+_CLEANUP_QUEUE = queue.Queue(_CLEANUP_MAX)
+_CLEANUP_SEQ = itertools.count()
+_CLEANUP_THREAD = [None]
+# In-memory temporary storage, the shared memory file system is used by the
+# "auto" backend if it has at least _SHM_MIN_FREE bytes available
+_SHM_DIR = "/dev/shm"
+_SHM_MIN_FREE = 64 * 1024 * 1024
+_MEMFD = hasattr(os, "memfd_create") and os.path.isdir("/proc/self/fd")
+# Temporary file contents types written in one call, in binary mode
+_BYTES_LIKE = (bytes, bytearray, memoryview)
+# Template directory population strategies, from cheapest to most expensive;
+# a strategy that fails falls back to the next one. FICLONE is the Linux
+# ioctl request that makes a file share the extents of another (reflink)
+_STRATEGIES = ["hardlink", "reflink", "copy"]
+_FICLONE = 0x40049409 if sys.platform.startswith("linux") else None
+# Deadline watchdog thread; heap items are [due time, sequence number,
+# deadline object, active flag] lists, finished deadlines are only marked
+# as not active so that exiting a block that met its deadline is cheap
+_WATCHDOG = threading.Condition()
+_WATCHDOG_HEAP = []
+_WATCHDOG_SEQ = itertools.count()
+_WATCHDOG_THREAD = [None]
+# Timers that track garbage collections (replaced, never mutated, so that
+# the collector callback can iterate over it without locking) and start
+# time of the collection in progress
+_GC_LOCK = threading.Lock()
+_GC_TIMERS = ()
+_GC_START = [None]
+
+
 ###
 # Context managers
 ###
@@ -86,6 +618,216 @@ def ignored(*exceptions):
         pass
 
 
+class deadline(object):  # pylint: disable=C0103
+    r"""
+    Enforce a latency budget on a code block.
+
+    Whether the block overran its budget is recorded upon exit (see
+    :py:attr:`pmisc.deadline.overrun`). Optionally a shared watchdog thread
+    detects overruns while the block is still running and calls a callback
+    and/or takes a snapshot of the stack of the overrunning block. Entering
+    and exiting a block that meets its deadline only adds an entry to the
+    watchdog queue and marks it as finished, and without callback or
+    snapshot nothing is queued at all
+
+    In the main thread of Unix platforms the context manager can instead
+    raise a :py:class:`TimeoutError` exception in the block when the
+    deadline expires, using a :code:`SIGALRM` interval timer. Deadlines in
+    this mode can be nested, the outer timer is re-armed on exit
+
+    :param seconds: Latency budget, in seconds
+    :type  seconds: positive float
+
+    :param callback: Function called (in the watchdog thread) with the
+                     deadline object as its only argument when the deadline
+                     expires and the block has not finished
+    :type  callback: callable or None
+
+    :param snapshot: Flag that indicates whether the stack of the block is
+                     captured when the deadline expires and the block has not
+                     finished (True) or not (False), see
+                     :py:attr:`pmisc.deadline.snapshot`
+    :type  snapshot: boolean
+
+    :param raise_exc: Flag that indicates whether a
+                      :py:class:`TimeoutError` exception is raised in the
+                      block when the deadline expires (True) or not
+                      (False). Nested deadlines are supported, an
+                      enclosing deadline that is due first is raised on
+                      time
+    :type  raise_exc: boolean
+
+    :returns: :py:class:`pmisc.deadline`
+
+    :raises RuntimeError: Argument \`callback\` is not valid
+    :raises RuntimeError: Argument \`raise_exc\` is not valid
+    :raises RuntimeError: Argument \`seconds\` is not valid
+    :raises RuntimeError: Argument \`snapshot\` is not valid
+    :raises RuntimeError: Deadlines can only raise exceptions in the main
+                          thread
+    :raises TimeoutError: Deadline of *[seconds]* seconds exceeded
+
+    For example:
+
+        >>> import time, pmisc
+        >>> with pmisc.deadline(0.01, snapshot=True) as dobj:
+        ...     time.sleep(0.1)
+        >>> dobj.overrun
+        True
+        >>> "time.sleep(0.1)" in dobj.snapshot
+        True
+    """
+
+    # pylint: disable=R0902
+    def __init__(self, seconds, callback=None, snapshot=False, raise_exc=False):  # noqa
+        if (
+            isinstance(seconds, bool)
+            or (not isinstance(seconds, (int, float)))
+            or (seconds <= 0)
+        ):
+            raise RuntimeError("Argument `seconds` is not valid")
+        if (callback is not None) and (not callable(callback)):
+            raise RuntimeError("Argument `callback` is not valid")
+        if not isinstance(snapshot, bool):
+            raise RuntimeError("Argument `snapshot` is not valid")
+        if (not isinstance(raise_exc, bool)) or (
+            raise_exc and (not hasattr(signal, "setitimer"))
+        ):
+            raise RuntimeError("Argument `raise_exc` is not valid")
+        self._seconds = seconds
+        self._callback = callback
+        self._snapshot_flag = snapshot
+        self._raise_exc = raise_exc
+        self._tid = None
+        self._tstart = None
+        self._entry = None
+        self._prev_handler = None
+        self._prev_timer = None
+        self._armed = False
+        self._elapsed = None
+        self._overrun = None
+        self._snapshot = None
+
+    def __enter__(self):  # noqa
+        if self._raise_exc:
+            if threading.current_thread() is not threading.main_thread():
+                raise RuntimeError(
+                    "Deadlines can only raise exceptions in the main thread"
+                )
+            # The pending alarm (of an enclosing deadline, for example) is
+            # left alone if it is due before this deadline, so that it is
+            # raised on time
+            delay = signal.getitimer(signal.ITIMER_REAL)[0]
+            self._armed = (not delay) or (delay > self._seconds)
+            if self._armed:
+                self._prev_handler = signal.signal(signal.SIGALRM, self._alarm)
+                self._prev_timer = signal.setitimer(
+                    signal.ITIMER_REAL, self._seconds
+                )
+        self._snapshot = None
+        self._tid = threading.get_ident()
+        self._tstart = _CLOCKS["wall"]()
+        if self._callback or self._snapshot_flag:
+            entry = [
+                self._tstart + int(1e9 * self._seconds),
+                next(_WATCHDOG_SEQ),
+                self,
+                True,
+            ]
+            with _WATCHDOG:
+                if _WATCHDOG_THREAD[0] is None:
+                    _WATCHDOG_THREAD[0] = threading.Thread(
+                        target=_watchdog, name="pmisc-deadline"
+                    )
+                    _WATCHDOG_THREAD[0].daemon = True
+                    _WATCHDOG_THREAD[0].start()
+                heapq.heappush(_WATCHDOG_HEAP, entry)
+                if _WATCHDOG_HEAP[0] is entry:
+                    _WATCHDOG.notify()
+            self._entry = entry
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):  # noqa
+        elapsed = _CLOCKS["wall"]() - self._tstart
+        if self._entry is not None:
+            self._entry[3] = False
+            self._entry = None
+        if self._raise_exc and self._armed:
+            self._armed = False
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, self._prev_handler)
+            delay, interval = self._prev_timer
+            if delay > 0:
+                signal.setitimer(
+                    signal.ITIMER_REAL, max(delay - elapsed / 1e9, 1e-6), interval
+                )
+        self._elapsed = elapsed / 1e9
+        self._overrun = self._elapsed > self._seconds
+        return not exc_type is not None
+
+    def _alarm(self, signum, frame):
+        """Raise the deadline exception in the block."""
+        raise TimeoutError("Deadline of {0} seconds exceeded".format(self._seconds))
+
+    def _fire(self, entry):
+        """Take stack snapshot and call callback of an expired deadline."""
+        if not entry[3]:
+            return
+        if self._snapshot_flag:
+            frame = sys._current_frames().get(self._tid)  # pylint: disable=W0212
+            if frame is not None:
+                self._snapshot = "".join(traceback.format_stack(frame))
+        if self._callback is not None:
+            try:
+                self._callback(self)
+            except Exception:  # pylint: disable=W0703
+                traceback.print_exc()
+
+    def _get_elapsed(self):
+        return self._elapsed
+
+    def _get_overrun(self):
+        return self._overrun
+
+    def _get_seconds(self):
+        return self._seconds
+
+    def _get_snapshot(self):
+        return self._snapshot
+
+    elapsed = property(_get_elapsed, doc="Elapsed time")
+    """
+    Returns the time (in seconds) the block took. None if the block has not
+    finished
+
+    :rtype: float or None
+    """
+
+    overrun = property(_get_overrun, doc="Deadline overrun flag")
+    """
+    Returns True if the block took longer than the latency budget, False
+    otherwise. None if the block has not finished
+
+    :rtype: boolean or None
+    """
+
+    seconds = property(_get_seconds, doc="Latency budget")
+    """
+    Returns the latency budget, in seconds
+
+    :rtype: float
+    """
+
+    snapshot = property(_get_snapshot, doc="Stack snapshot")
+    """
+    Returns the stack (formatted as by :py:func:`traceback.format_stack`) of
+    the block when the deadline expired, if requested and the block had not
+    finished by then. None otherwise
+
+    :rtype: string or None
+    """
+
+
 class Timer(object):
     r"""
     Time profile of code blocks.
@@ -94,12 +836,87 @@ class Timer(object):
     manager entry and exit time points.  Inspired by `Huy Nguyen's blog
     <http://pythonic.zoomquiet.top/data/20170602154836/index.html>`_.
 
-    :param verbose: Flag that indicates whether the elapsed time is printed
-                    upon exit (True) or not (False)
+    Time is measured with nanosecond-resolution, monotonic clocks. A timer
+    object can be entered multiple times, each context manager entry/exit
+    interval is a lap and the elapsed time is accumulated across laps. The
+    lap in progress is kept per thread and asynchronous task, so a timer
+    object can be shared by (and entered concurrently in) several of them,
+    and it can be entered again in a block it is timing
+
+    The timer can also be used as an asynchronous context manager
+    (:code:`async with`). In that mode the CPU time of the thread running
+    the event loop is measured as well, and the difference between the
+    elapsed and the CPU time is an estimate of the time the block was
+    suspended in :code:`await` expressions (see
+    :py:attr:`pmisc.Timer.cpu_ns` and :py:attr:`pmisc.Timer.suspended_ns`).
+    Named timers in concurrent tasks are nested independently of each other
+
+    The time taken by the context manager and clock calls themselves, the
+    overhead of the timer, is calibrated once per process and clock (see
+    :py:attr:`pmisc.Timer.overhead_ns`) and can be subtracted from each
+    lap. Laps that are not much longer than the overhead or the clock
+    resolution (see :py:attr:`pmisc.Timer.resolution_ns`) are dominated by
+    measurement noise
+
+    Laps of named timers are recorded in the active trace recorder, if any,
+    see :py:class:`pmisc.TraceRecorder`
+
+    Garbage collector pauses that happen while the timer is running can be
+    tracked (see :py:attr:`pmisc.Timer.gc_pause_ns`), to tell apart blocks
+    that are slow because of the code they run from blocks that are slow
+    because of allocation pressure. The collector stops all threads, so a
+    collection is reported to every tracking timer running at the time,
+    regardless of the thread that triggered it
+
+    :param verbose: Flag that indicates whether the elapsed time of the lap
+                    is printed upon exit (True) or not (False)
     :type  verbose: boolean
 
+    :param clock: Clock used to measure time, one of :code:`'wall'`
+                  (`time.perf_counter()
+                  <https://docs.python.org/3/library/time.html#time.perf_counter>`_,
+                  includes time sleeping or waiting), :code:`'process'`
+                  (CPU time of the current process) or :code:`'thread'`
+                  (CPU time of the current thread, if supported by the
+                  platform)
+    :type  clock: string
+
+    :param name: Timer name. If not None each lap is recorded in a timer
+                 registry, see :py:class:`pmisc.TimerRegistry`
+    :type  name: string or None
+
+    :param registry: Timer registry to record laps in. If None the default
+                     registry (:py:func:`pmisc.timer_registry`) is used
+    :type  registry: :py:class:`pmisc.TimerRegistry` or None
+
+    :param histogram: Histogram to record laps (in nanoseconds) in
+    :type  histogram: :py:class:`pmisc.Histogram` or None
+
+    :param track_gc: Flag that indicates whether garbage collections that
+                     happen while the timer is running are tracked (True)
+                     or not (False)
+    :type  track_gc: boolean
+
+    :param subtract_overhead: Flag that indicates whether the timer overhead
+                              is subtracted from each lap (True) or not
+                              (False). Laps are never negative
+    :type  subtract_overhead: boolean
+
+    :param keep_laps: Number of most recent laps kept (see
+                      :py:attr:`pmisc.Timer.laps`), so that the memory used
+                      by a long-lived timer is bounded. The accumulated
+                      elapsed time, the last lap and the number of laps are
+                      always kept
+    :type  keep_laps: non-negative integer
+
     :returns: :py:class:`pmisc.Timer`
 
+    :raises RuntimeError: Argument \`clock\` is not valid
+    :raises RuntimeError: Argument \`histogram\` is not valid
+    :raises RuntimeError: Argument \`keep_laps\` is not valid
+    :raises RuntimeError: Argument \`name\` is not valid
+    :raises RuntimeError: Argument \`subtract_overhead\` is not valid
+    :raises RuntimeError: Argument \`track_gc\` is not valid
     :raises RuntimeError: Argument \`verbose\` is not valid
 
     For example:
@@ -138,35 +955,332 @@ class Timer(object):
         Time per call: ... seconds
     """
 
-    def __init__(self, verbose=False):  # noqa
+    # pylint: disable=R0902,R0913
+    def __init__(
+        self,
+        verbose=False,
+        clock="wall",
+        name=None,
+        registry=None,
+        histogram=None,
+        track_gc=False,
+        subtract_overhead=False,
+        keep_laps=1000,
+    ):  # noqa
         if not isinstance(verbose, bool):
             raise RuntimeError("Argument `verbose` is not valid")
-        self._tstart = None
-        self._tstop = None
-        self._elapsed_time = None
+        if (not isinstance(clock, str)) or (clock not in _CLOCKS):
+            raise RuntimeError("Argument `clock` is not valid")
+        if (name is not None) and ((not isinstance(name, str)) or (not name)):
+            raise RuntimeError("Argument `name` is not valid")
+        if (histogram is not None) and (not isinstance(histogram, Histogram)):
+            raise RuntimeError("Argument `histogram` is not valid")
+        if not isinstance(track_gc, bool):
+            raise RuntimeError("Argument `track_gc` is not valid")
+        if not isinstance(subtract_overhead, bool):
+            raise RuntimeError("Argument `subtract_overhead` is not valid")
+        if (
+            isinstance(keep_laps, bool)
+            or (not isinstance(keep_laps, int))
+            or (keep_laps < 0)
+        ):
+            raise RuntimeError("Argument `keep_laps` is not valid")
+        self._clock = _CLOCKS[clock]
+        self._clock_name = clock
         self._verbose = verbose
+        self._name = name
+        self._registry = registry
+        self._histogram = histogram
+        self._running = set()
+        self._elapsed_ns = 0
+        self._laps = collections.deque(maxlen=keep_laps)
+        self._lap_count = 0
+        self._last_lap_ns = None
+        self._cpu_ns = None
+        self._suspended_ns = None
+        self._track_gc = track_gc
+        self._gc_pause_ns = 0
+        self._gc_generations = [0] * len(gc.get_count())
+        self._overhead = _calibrate(clock)[0] if subtract_overhead else 0
 
     def __enter__(self):  # noqa
-        self._tstart = time.time()
-        return self
+        return self._begin(None, None)
 
     def __exit__(self, exc_type, exc_value, exc_tb):  # noqa
-        self._tstop = time.time()
-        # time.time() returns time in seconds since the epoch
-        self._elapsed_time = 1000.0 * (self._tstop - self._tstart)
-        if self._verbose:
-            print("Elapsed time: {time}[msec]".format(time=self._elapsed_time))
+        self._end()
         return not exc_type is not None
 
+    async def __aenter__(self):  # noqa
+        return self._begin(_CPU_CLOCK(), next(_TRACE_IDS))
+
+    async def __aexit__(self, exc_type, exc_value, exc_tb):  # noqa
+        cpu_end = _CPU_CLOCK()
+        lap, state = self._end()
+        cpu = cpu_end - state.cpu_start
+        self._cpu_ns = (self._cpu_ns or 0) + cpu
+        self._suspended_ns = (self._suspended_ns or 0) + max(0, lap - cpu)
+        return not exc_type is not None
+
+    def _begin(self, cpu_start, trace_id):
+        """Start a lap in the current thread or asynchronous task."""
+        state = _Lap(self, _TIMER_LAP.get(), cpu_start, trace_id)
+        if self._name is not None:
+            state.path, state.path_token = _push_timer(self._name)
+            state.trace = _RECORDER[0]
+            if state.trace is not None:
+                # pylint: disable=W0212
+                state.trace._add(
+                    "B" if trace_id is None else "b",
+                    self._name,
+                    {"path": "/".join(state.path)},
+                    trace_id,
+                )
+        if self._track_gc:
+            _gc_attach(self)
+        state.token = _TIMER_LAP.set(state)
+        self._running.add(state)
+        state.tstart = self._clock()
+        return self
+
+    def _end(self):
+        """Finish the lap of the current thread or asynchronous task."""
+        tend = self._clock()
+        state = _TIMER_LAP.get()
+        if (state is None) or (state.timer is not self):
+            raise RuntimeError("Timer is not running")
+        lap = tend - state.tstart
+        if self._overhead:
+            lap = max(0, lap - self._overhead)
+        _TIMER_LAP.reset(state.token)
+        self._running.discard(state)
+        if self._track_gc:
+            _gc_detach(self)
+        self._elapsed_ns += lap
+        self._lap_count += 1
+        self._last_lap_ns = lap
+        self._laps.append(lap)
+        if self._name is not None:
+            _pop_timer(state.path_token)
+            if state.trace is not None:
+                # pylint: disable=W0212
+                state.trace._add(
+                    "E" if state.trace_id is None else "e",
+                    self._name,
+                    None,
+                    state.trace_id,
+                )
+            (self._registry or timer_registry()).record(state.path, lap)
+        if self._histogram is not None:
+            self._histogram.record(lap)
+        if self._verbose:
+            print("Elapsed time: {time}[msec]".format(time=lap / 1e6))
+        return lap, state
+
+    def reset(self):
+        """
+        Discard all laps.
+
+        :raises RuntimeError: Timer is running
+        """
+        if self._running:
+            raise RuntimeError("Timer is running")
+        self._elapsed_ns = 0
+        self._laps.clear()
+        self._lap_count = 0
+        self._last_lap_ns = None
+        self._cpu_ns = None
+        self._suspended_ns = None
+        self._gc_pause_ns = 0
+        self._gc_generations = [0] * len(self._gc_generations)
+
+    def split(self):
+        """
+        Return the accumulated elapsed time up to this point, in nanoseconds.
+
+        If the timer is running in the current thread or asynchronous task the
+        time elapsed in the current lap so far is included, the timer is not
+        stopped
+
+        :rtype: integer
+        """
+        state = _TIMER_LAP.get()
+        while (state is not None) and (state.timer is not self):
+            state = state.parent
+        if state is None:
+            return self._elapsed_ns
+        return self._elapsed_ns + (self._clock() - state.tstart)
+
+    def _get_clock(self):
+        return self._clock_name
+
+    def _get_cpu_ns(self):
+        return self._cpu_ns
+
+    def _get_elapsed_ns(self):
+        return self._elapsed_ns
+
     def _get_elapsed_time(self):
-        return self._elapsed_time
+        return None if self._last_lap_ns is None else self._last_lap_ns / 1e6
+
+    def _get_gc_collections(self):
+        return sum(self._gc_generations) if self._track_gc else None
+
+    def _get_gc_generations(self):
+        return tuple(self._gc_generations) if self._track_gc else None
+
+    def _get_gc_pause_ns(self):
+        return self._gc_pause_ns if self._track_gc else None
+
+    def _get_lap_count(self):
+        return self._lap_count
+
+    def _get_laps(self):
+        return tuple(self._laps)
+
+    def _get_last_lap_ns(self):
+        return self._last_lap_ns
+
+    def _get_name(self):
+        return self._name
+
+    def _get_overhead_ns(self):
+        return _calibrate(self._clock_name)[0]
+
+    def _get_resolution_ns(self):
+        return _calibrate(self._clock_name)[1]
+
+    def _get_suspended_ns(self):
+        return self._suspended_ns
+
+    clock = property(_get_clock, doc="Clock used to measure time")
+    """
+    Returns the name of the clock used to measure time
+
+    :rtype: string
+    """
+
+    cpu_ns = property(_get_cpu_ns, doc="CPU time in nanoseconds")
+    """
+    Returns the CPU time (in nanoseconds) of the thread running the event loop
+    between asynchronous context manager entry and exit time points,
+    accumulated across all asynchronous laps. This includes CPU time used by
+    other tasks while the block was suspended. None if the timer has not been
+    used as an asynchronous context manager
+
+    :rtype: integer or None
+    """
+
+    elapsed_ns = property(_get_elapsed_ns, doc="Elapsed time in nanoseconds")
+    """
+    Returns elapsed time (in nanoseconds) between context manager entry and
+    exit time points, accumulated across all laps
+
+    :rtype: integer
+    """
 
     elapsed_time = property(_get_elapsed_time, doc="Elapsed time")
     """
     Returns elapsed time (in milliseconds) between context manager entry and
-    exit time points
+    exit time points of the last lap. None if the timer has not been used.
+    The time accumulated across all laps is returned by
+    :py:attr:`pmisc.Timer.elapsed_ns` and :py:meth:`pmisc.Timer.split`
 
-    :rtype: float
+    :rtype: float or None
+    """
+
+    gc_collections = property(_get_gc_collections, doc="Garbage collections")
+    """
+    Returns the number of garbage collections that happened while the timer
+    was running, accumulated across all laps. None if garbage collections are
+    not tracked
+
+    :rtype: integer or None
+    """
+
+    gc_generations = property(
+        _get_gc_generations, doc="Garbage collections per generation"
+    )
+    """
+    Returns the number of garbage collections that happened while the timer
+    was running, per generation (item 0 is the number of collections of
+    generation 0, item 1 the number of collections of generation 1, etc.),
+    accumulated across all laps. A collection of a generation also covers the
+    younger generations. None if garbage collections are not tracked
+
+    :rtype: tuple of integers or None
+    """
+
+    gc_pause_ns = property(_get_gc_pause_ns, doc="Garbage collection pause time")
+    """
+    Returns the wall-clock time (in nanoseconds) spent in garbage collections
+    while the timer was running, accumulated across all laps. Subtracting it
+    from :py:attr:`pmisc.Timer.elapsed_ns` gives the time used by the block
+    itself. None if garbage collections are not tracked
+
+    :rtype: integer or None
+    """
+
+    lap_count = property(_get_lap_count, doc="Number of laps")
+    """
+    Returns the number of context manager entry/exit intervals
+
+    :rtype: integer
+    """
+
+    laps = property(_get_laps, doc="Lap times")
+    """
+    Returns elapsed time (in nanoseconds) of each context manager entry/exit
+    interval, in order of completion. At most the number of laps given by
+    the **keep_laps** argument are kept, older laps are discarded
+
+    :rtype: tuple of integers
+    """
+
+    last_lap_ns = property(_get_last_lap_ns, doc="Last lap time")
+    """
+    Returns elapsed time (in nanoseconds) of the last context manager
+    entry/exit interval. None if the timer has not been used
+
+    :rtype: integer or None
+    """
+
+    name = property(_get_name, doc="Timer name")
+    """
+    Returns the timer name
+
+    :rtype: string or None
+    """
+
+    overhead_ns = property(_get_overhead_ns, doc="Timer overhead in nanoseconds")
+    """
+    Returns the time (in nanoseconds) measured by the timer for an empty
+    block, with the clock used by the timer. It is calibrated the first time
+    it is needed in the process (for each clock), as the median of the
+    median lap times of several rounds of empty blocks
+
+    :rtype: integer
+    """
+
+    resolution_ns = property(_get_resolution_ns, doc="Clock resolution")
+    """
+    Returns the resolution (in nanoseconds) of the clock used by the timer,
+    as the smallest observed clock increment. It is measured the first time
+    it is needed in the process (for each clock)
+
+    :rtype: integer
+    """
+
+    suspended_ns = property(_get_suspended_ns, doc="Suspended time in nanoseconds")
+    """
+    Returns an estimate of the time (in nanoseconds) the block was suspended
+    in :code:`await` expressions, accumulated across all asynchronous laps. It
+    is the elapsed time minus the CPU time of each lap, and is therefore a
+    lower bound when other tasks use CPU time while the block is suspended.
+    A block that does not yield to the event loop has a suspended time close
+    to zero. None if the timer has not been used as an asynchronous context
+    manager
+
+    :rtype: integer or None
     """
 
 
@@ -179,10 +1293,61 @@ class TmpDir(object):
                  under the default user's/system temporary directory
     :type  dpath: string or None
 
+    :param background: Flag that indicates whether the directory is removed
+                       in a background thread (True) or upon context
+                       manager exit (False). In background mode the
+                       directory is renamed upon exit, so that its name is
+                       free immediately, and removed by a cleanup thread;
+                       at most 64 removals are pending at any time (further
+                       removals are done upon exit) and pending removals
+                       are completed upon interpreter exit
+    :type  background: boolean
+
+    :param backend: Storage of the (sub)directory when **dpath** is None,
+                    :code:`'default'` (the default user's/system temporary
+                    directory) or :code:`'auto'` (the in-memory
+                    :code:`/dev/shm` file system if it exists and has at
+                    least 64 MiB available, the default temporary directory
+                    otherwise)
+    :type  backend: string
+
+    :param template: Directory the temporary directory is populated from
+                     upon context manager entry. Its sub-directories are
+                     re-created, symbolic links are copied as links and
+                     files are populated in parallel, with the strategy
+                     given by **strategy**. Special files (named pipes,
+                     sockets or devices) are not supported
+    :type  template: string or None
+
+    :param strategy: Cheapest mechanism used to populate files from
+                     **template**, :code:`'hardlink'` (the file is a hard
+                     link to the template file, so changes to it are
+                     changes to the template file), :code:`'reflink'` (the
+                     file shares storage with the template file until
+                     either one is changed, Linux file systems that support
+                     the FICLONE ioctl such as Btrfs and XFS) or
+                     :code:`'copy'` (the file data is copied, in the kernel
+                     with :py:func:`os.copy_file_range` where available). A
+                     strategy that is not available falls back to the next
+                     one in this order; the strategy actually used is
+                     reported by :py:attr:`pmisc.TmpDir.strategy`. Copied
+                     files keep their permission bits
+    :type  strategy: string
+
     :returns:   temporary directory absolute path
 
+    :raises RuntimeError: Argument \`background\` is not valid
+
+    :raises RuntimeError: Argument \`backend\` is not valid
+
     :raises RuntimeError: Argument \`dpath\` is not valid
 
+    :raises RuntimeError: Argument \`strategy\` is not valid
+
+    :raises RuntimeError: Argument \`template\` is not valid
+
+    :raises shutil.SpecialFileError: \`*[path]*\` is not a regular file
+
     .. warning:: The file name returned uses the forward slash (``/``) as
        the path separator regardless of the platform. This avoids
        `problems <https://pythonconquerstheuniverse.wordpress.com/2008/06/04/
@@ -195,50 +1360,334 @@ class TmpDir(object):
        separator if needed
     """
 
-    def __init__(self, dpath=None):  # noqa
+    # pylint: disable=R0913
+    def __init__(
+        self,
+        dpath=None,
+        background=False,
+        backend="default",
+        template=None,
+        strategy="reflink",
+    ):  # noqa
         if (dpath is not None) and (
             (not isinstance(dpath, str))
             or (isinstance(dpath, str) and not os.path.isdir(dpath))
         ):
             raise RuntimeError("Argument `dpath` is not valid")
+        if not isinstance(background, bool):
+            raise RuntimeError("Argument `background` is not valid")
+        if (not isinstance(backend, str)) or (backend not in ["default", "auto"]):
+            raise RuntimeError("Argument `backend` is not valid")
+        if (template is not None) and (
+            (not isinstance(template, str)) or (not os.path.isdir(template))
+        ):
+            raise RuntimeError("Argument `template` is not valid")
+        if (not isinstance(strategy, str)) or (strategy not in _STRATEGIES):
+            raise RuntimeError("Argument `strategy` is not valid")
         self._dpath = os.path.abspath(dpath) if (dpath is not None) else dpath
+        self._background = background
+        self._backend = backend
+        self._template = template
+        self._strategy = strategy
+        self._used = None
         self._dname = None
 
     def __enter__(self):  # noqa
-        dname = tempfile.mkdtemp(dir=self._dpath)
+        dpath = self._dpath
+        if (dpath is None) and (self._backend == "auto"):
+            dpath = _shm_dir()
+        dname = tempfile.mkdtemp(dir=dpath)
         if platform.system().lower() == "windows":  # pragma: no cover
             dname = dname.replace(os.sep, "/")
         self._dname = dname
+        if self._template is not None:
+            try:
+                self._populate()
+            except:
+                self.__exit__(None, None, None)
+                raise
         return self._dname
 
     def __exit__(self, exc_type, exc_value, exc_tb):  # noqa
-        with ignored(OSError):
-            shutil.rmtree(self._dname)
+        if self._background:
+            _defer_removal(self._dname, tombstone=True)
+        else:
+            with ignored(OSError):
+                shutil.rmtree(self._dname)
+        return not exc_type is not None
+
+    def _populate(self):
+        """Populate directory from template."""
+        files = []
+        _clone_tree(self._template, self._dname, files)
+        # Strategies that fail once are not tried again for other files
+        clone = functools.partial(_clone_file, strategy=self._strategy, failed=set())
+        # File data is copied by the kernel, more threads than CPUs only add
+        # contention
+        workers = min(len(files), os.cpu_count() or 1)
+        if workers < 2:
+            used = [clone(src, dst) for src, dst in files]
+        else:
+            # Imported here, it pulls in the logging module
+            # pylint: disable=C0415
+            from concurrent.futures import ThreadPoolExecutor
+
+            with ThreadPoolExecutor(workers) as pool:
+                used = list(pool.map(clone, *zip(*files)))
+        self._used = max(used, key=_STRATEGIES.index) if used else self._strategy
+
+    def _get_strategy(self):
+        return self._used
+
+    strategy = property(_get_strategy, doc="Template population strategy")
+    """
+    Returns the strategy used to populate the directory from the template
+    (see :py:class:`pmisc.TmpDir`), the most expensive one if files fell back
+    to different strategies, or None if there is no template or the context
+    manager has not been entered
+
+    :rtype: string or None
+    """
+
+
+class TmpDirPool(object):
+    r"""
+    Pool of reusable temporary directories.
+
+    Creating and removing a temporary directory each time one is needed (see
+    :py:class:`pmisc.TmpDir`) is slow when it is done thousands of times. A
+    pool hands out directories created in advance and, when they are
+    released, removes their contents but keeps the directories for reuse. At
+    most **size** idle directories are kept, directories released when the
+    pool is full are removed. The pool can be used from several threads, and
+    idle directories are removed when the pool is closed (see
+    :py:meth:`pmisc.TmpDirPool.close`), garbage collected or upon
+    interpreter exit
+
+    :param size: Maximum number of idle directories, all of them are
+                 created when the pool is created
+    :type  size: positive integer
+
+    :param dpath: Directory under which temporary directories are to be
+                  created. If None the directories are created under the
+                  default user's/system temporary directory
+    :type  dpath: string or None
+
+    :returns: :py:class:`pmisc.TmpDirPool`
+
+    :raises RuntimeError: Argument \`dpath\` is not valid
+    :raises RuntimeError: Argument \`size\` is not valid
+
+    For example:
+
+        >>> import os, pmisc
+        >>> with pmisc.TmpDirPool(size=2) as pool:
+        ...     with pool.tmpdir() as dname:
+        ...         open(os.path.join(dname, "data.txt"), "w").close()
+        ...     with pool.tmpdir() as dname2:
+        ...         os.listdir(dname2)
+        []
+    """
+
+    def __init__(self, size=4, dpath=None):  # noqa
+        if isinstance(size, bool) or (not isinstance(size, int)) or (size < 1):
+            raise RuntimeError("Argument `size` is not valid")
+        if (dpath is not None) and (
+            (not isinstance(dpath, str)) or (not os.path.isdir(dpath))
+        ):
+            raise RuntimeError("Argument `dpath` is not valid")
+        self._size = size
+        self._dpath = os.path.abspath(dpath) if (dpath is not None) else dpath
+        self._lock = threading.Lock()
+        self._idle = [self._mkdtemp() for _ in range(size)]
+        self._busy = set()
+        self._finalizer = weakref.finalize(self, _remove_dirs, self._idle)
+
+    def __enter__(self):  # noqa
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):  # noqa
+        self.close()
         return not exc_type is not None
 
+    def _mkdtemp(self):
+        dname = tempfile.mkdtemp(dir=self._dpath)
+        if platform.system().lower() == "windows":  # pragma: no cover
+            dname = dname.replace(os.sep, "/")
+        return dname
+
+    def acquire(self):
+        """
+        Return an empty temporary directory.
+
+        The directory is created if there are no idle directories in the pool
+
+        :rtype: string
+        """
+        with self._lock:
+            dname = self._idle.pop() if self._idle else None
+        if dname is None:
+            dname = self._mkdtemp()
+        with self._lock:
+            self._busy.add(dname)
+        return dname
+
+    def close(self):
+        """Remove the idle directories, the pool can still be used."""
+        with self._lock:
+            dnames, self._idle[:] = self._idle[:], []
+        _remove_dirs(dnames)
+
+    def release(self, dname):
+        r"""
+        Return a directory to the pool.
+
+        The directory contents are removed. If the pool is full or the
+        contents cannot be removed the directory itself is removed
+
+        :param dname: Directory, as returned by
+                      :py:meth:`pmisc.TmpDirPool.acquire`
+        :type  dname: string
+
+        :raises RuntimeError: Argument \`dname\` is not valid
+        """
+        with self._lock:
+            if dname not in self._busy:
+                raise RuntimeError("Argument `dname` is not valid")
+            self._busy.remove(dname)
+            keep = len(self._idle) < self._size
+        if keep:
+            try:
+                _empty_dir(dname)
+            except OSError:
+                keep = False
+        if keep:
+            with self._lock:
+                keep = len(self._idle) < self._size
+                if keep:
+                    self._idle.append(dname)
+        if not keep:
+            shutil.rmtree(dname, ignore_errors=True)
+
+    @decorator.contextmanager
+    def tmpdir(self):
+        """
+        Context manager that acquires a directory and releases it upon exit.
+
+        Returns the directory name
+        """
+        dname = self.acquire()
+        try:
+            yield dname
+        finally:
+            self.release(dname)
+
 
 class TmpFile(object):
     r"""
     Creates a temporary file that is deleted at context manager exit.
 
     The context manager can optionally set up hooks for a provided function to
-    write data to the created temporary file.
+    write data to the created temporary file, and/or write given contents to
+    it. Data is written through the descriptor the file is created with, the
+    file is not re-opened
 
-    :param fpointer: Pointer to a function that writes data to file.
-                     If the argument is not None the function pointed to
-                     receives exactly one argument, a file-like object
-    :type  fpointer: function object or None
+    :param fpointer: Pointer to a function (or any other callable) that writes
+                     data to file. If the argument is not None the function
+                     pointed to receives exactly one argument, a file-like
+                     object
+    :type  fpointer: callable or None
 
     :param args: Positional arguments for pointer function
     :type  args: any
 
-    :param kwargs: Keyword arguments for pointer function
+    :param kwargs: Keyword arguments for pointer function. The
+                   :code:`background`, :code:`backend`, :code:`contents`,
+                   :code:`binary`, :code:`buffering`, :code:`size` and
+                   :code:`mapped` keywords are arguments of this class and
+                   are not passed to the function. Use
+                   :py:func:`functools.partial` to pass keyword arguments
+                   with these names to the function
     :type  kwargs: any
 
-    :returns:   temporary file name
+    :param background: Flag that indicates whether the file is removed in a
+                       background thread (True) or upon context manager exit
+                       (False), see :py:class:`pmisc.TmpDir`. Keyword-only
+                       argument
+    :type  background: boolean
+
+    :param backend: File storage, :code:`'default'` (the default
+                    user's/system temporary directory), :code:`'auto'` (see
+                    :py:class:`pmisc.TmpDir`) or :code:`'memfd'` (an
+                    anonymous in-memory file created with
+                    :py:func:`os.memfd_create`, Linux only). A memfd file
+                    name is a :code:`/proc/self/fd/[N]` path, valid only in
+                    the current process, and the file is released upon
+                    context manager exit regardless of **background**.
+                    Keyword-only argument
+    :type  backend: string
+
+    :param contents: Data written to the file (before the function pointed
+                     to by **fpointer** is called, if any), either a single
+                     string (text mode) or bytes-like object (binary mode),
+                     or an iterable of them written in chunks. Keyword-only
+                     argument
+    :type  contents: string, bytes, bytearray, memoryview, iterable or None
+
+    :param binary: Flag that indicates whether the file is written in
+                   binary mode (True) or text mode (False). Keyword-only
+                   argument
+    :type  binary: boolean
+
+    :param buffering: Buffer size of the file object data is written with,
+                      as in :py:func:`open` (-1 is the default buffer size, 0
+                      disables buffering and is only valid in binary mode).
+                      Keyword-only argument
+    :type  buffering: integer
+
+    :param size: File size, in bytes. If not None storage for the file is
+                 preallocated with :py:func:`os.posix_fallocate` (where
+                 available, otherwise the file is only extended with
+                 :py:func:`os.ftruncate`) before any data is written, so
+                 running out of space is detected upon context manager
+                 entry. Keyword-only argument
+    :type  size: positive integer or None
+
+    :param mapped: Flag that indicates whether the file is memory-mapped
+                   (True) or not (False). If True the context manager
+                   returns a (file name, :py:class:`mmap.mmap` object)
+                   tuple, the mapping is writable, shared and covers the
+                   whole file after **size**, **contents** and
+                   **fpointer** are applied; it is closed upon context
+                   manager exit, before the file is removed. Buffers
+                   exported by the mapping (:py:class:`memoryview`
+                   objects for example) must be released before the
+                   context manager exits, otherwise the mapping cannot be
+                   closed and :code:`BufferError` is raised, unless the
+                   block raised an exception, which is propagated instead.
+                   Mapping an empty file raises :code:`ValueError`.
+                   Keyword-only argument
+    :type  mapped: boolean
+
+    :returns:   temporary file name, or temporary file name and memory map
+                if **mapped** is True
+
+    :raises RuntimeError: Argument \`background\` is not valid
+
+    :raises RuntimeError: Argument \`backend\` is not valid
+
+    :raises RuntimeError: Argument \`binary\` is not valid
+
+    :raises RuntimeError: Argument \`buffering\` is not valid
+
+    :raises RuntimeError: Argument \`contents\` is not valid
 
     :raises RuntimeError: Argument \`fpointer\` is not valid
 
+    :raises RuntimeError: Argument \`mapped\` is not valid
+
+    :raises RuntimeError: Argument \`size\` is not valid
+
     .. warning:: The file name returned uses the forward slash (``/``) as
        the path separator regardless of the platform. This avoids
        `problems <https://pythonconquerstheuniverse.wordpress.com/2008/06/04/
@@ -282,33 +1731,269 @@ class TmpFile(object):
         Hello world!
     """
 
-    def __init__(self, fpointer=None, *args, **kwargs):  # noqa
+    # pylint: disable=R0902,R0913
+    def __init__(
+        self,
+        fpointer=None,
+        *args,
+        background=False,
+        backend="default",
+        contents=None,
+        binary=False,
+        buffering=-1,
+        size=None,
+        mapped=False,
+        **kwargs
+    ):  # noqa
+        if fpointer and (not callable(fpointer)):
+            raise RuntimeError("Argument `fpointer` is not valid")
+        if not isinstance(background, bool):
+            raise RuntimeError("Argument `background` is not valid")
+        if (not isinstance(backend, str)) or (
+            backend not in ["default", "auto"] + (["memfd"] if _MEMFD else [])
+        ):
+            raise RuntimeError("Argument `backend` is not valid")
+        if not isinstance(binary, bool):
+            raise RuntimeError("Argument `binary` is not valid")
         if (
-            fpointer
-            and (not isinstance(fpointer, types.FunctionType))
-            and (not isinstance(fpointer, types.LambdaType))
+            isinstance(buffering, bool)
+            or (not isinstance(buffering, int))
+            or (buffering < -1)
+            or ((buffering == 0) and (not binary))
         ):
-            raise RuntimeError("Argument `fpointer` is not valid")
+            raise RuntimeError("Argument `buffering` is not valid")
+        if (contents is not None) and _bad_contents(contents, binary):
+            raise RuntimeError("Argument `contents` is not valid")
+        if (size is not None) and (
+            isinstance(size, bool) or (not isinstance(size, int)) or (size <= 0)
+        ):
+            raise RuntimeError("Argument `size` is not valid")
+        if not isinstance(mapped, bool):
+            raise RuntimeError("Argument `mapped` is not valid")
+        self._background = background
+        self._backend = backend
+        self._contents = contents
+        self._binary = binary
+        self._buffering = buffering
+        self._size = size
+        self._mapped = mapped
+        self._map = None
+        self._memfd = None
         self._fname = None
         self._fpointer = fpointer
         self._args = args
         self._kwargs = kwargs
 
     def __enter__(self):  # noqa
-        fdesc, fname = tempfile.mkstemp()
-        # fdesc is an OS-level file descriptor, see problems if this
-        # is not properly closed in this post:
-        # https://www.logilab.org/blogentry/17873
-        os.close(fdesc)
-        if platform.system().lower() == "windows":  # pragma: no cover
-            fname = fname.replace(os.sep, "/")
+        if self._backend == "memfd":
+            # The descriptor is kept open, the file exists while it is
+            fdesc = self._memfd = os.memfd_create("pmisc")
+            fname = "/proc/self/fd/{0}".format(fdesc)
+        else:
+            dpath = _shm_dir() if self._backend == "auto" else None
+            fdesc, fname = tempfile.mkstemp(dir=dpath)
+            if platform.system().lower() == "windows":  # pragma: no cover
+                fname = fname.replace(os.sep, "/")
         self._fname = fname
-        if self._fpointer:
-            with open(self._fname, "w") as fobj:
-                self._fpointer(fobj, *self._args, **self._kwargs)
-        return self._fname
+        try:
+            try:
+                self._fill(fdesc)
+            finally:
+                # fdesc is an OS-level file descriptor, see problems if this
+                # is not properly closed in this post:
+                # https://www.logilab.org/blogentry/17873
+                if self._memfd is None:
+                    os.close(fdesc)
+        except:
+            self.__exit__(None, None, None)
+            raise
+        return (self._fname, self._map) if self._mapped else self._fname
 
     def __exit__(self, exc_type, exc_value, exc_tb):  # noqa
-        with ignored(OSError):
-            os.remove(self._fname)
+        # The mapping is not flushed, dirty pages of a removed file are
+        # never written back
+        try:
+            if self._map is not None:
+                fmap, self._map = self._map, None
+                try:
+                    fmap.close()
+                except BufferError:
+                    # Do not mask the exception raised in the block
+                    if exc_type is None:
+                        raise
+        finally:
+            if self._memfd is not None:
+                os.close(self._memfd)
+                self._memfd = None
+            elif self._background:
+                _defer_removal(self._fname, tombstone=False)
+            else:
+                with ignored(OSError):
+                    os.remove(self._fname)
         return not exc_type is not None
+
+    def _fill(self, fdesc):
+        """Preallocate, write and memory-map file."""
+        if self._size is not None:
+            _allocate(fdesc, self._size)
+        if self._fpointer or (self._contents is not None):
+            with os.fdopen(
+                fdesc, "wb" if self._binary else "w", self._buffering, closefd=False
+            ) as fobj:
+                _write_contents(fobj, self._contents)
+                if self._fpointer:
+                    self._fpointer(fobj, *self._args, **self._kwargs)
+        if self._mapped:
+            self._map = mmap.mmap(fdesc, 0)
+
+
+class TmpFiles(object):
+    r"""
+    Creates a batch of temporary files that are deleted at context manager exit.
+
+    The files are created in a private temporary directory (see
+    :py:class:`pmisc.TmpDir`) with counter-based names, zero-padded so that
+    they sort in creation order, and they are all deleted by removing the
+    directory. This is faster than creating (and deleting) the files one at
+    a time with :py:class:`pmisc.TmpFile`, and the files can be written
+    concurrently by a pool of threads
+
+    :param specs: Number of empty files to create, or file specifications.
+                  Each specification is either None (empty file), a
+                  callable that writes data to the file (it receives
+                  exactly one argument, a file-like object; use
+                  :py:func:`functools.partial` to pass further arguments),
+                  or the file contents as in :py:class:`pmisc.TmpFile`
+    :type  specs: non-negative integer or iterable
+
+    :param workers: Number of threads that write the files
+    :type  workers: positive integer
+
+    :param suffix: File name suffix, for example :code:`'.txt'`
+    :type  suffix: string
+
+    :param dpath: Directory under which the private directory is to be
+                  created, see :py:class:`pmisc.TmpDir`
+    :type  dpath: string or None
+
+    :param background: Flag that indicates whether the files are removed in
+                       a background thread (True) or upon context manager
+                       exit (False), see :py:class:`pmisc.TmpDir`
+    :type  background: boolean
+
+    :param backend: Storage of the files when **dpath** is None, see
+                    :py:class:`pmisc.TmpDir`
+    :type  backend: string
+
+    :param binary: Flag that indicates whether the files are written in
+                   binary mode (True) or text mode (False)
+    :type  binary: boolean
+
+    :returns:   list of temporary file names, in the order of **specs**
+
+    :raises RuntimeError: Argument \`background\` is not valid
+
+    :raises RuntimeError: Argument \`backend\` is not valid
+
+    :raises RuntimeError: Argument \`binary\` is not valid
+
+    :raises RuntimeError: Argument \`dpath\` is not valid
+
+    :raises RuntimeError: Argument \`specs\` is not valid
+
+    :raises RuntimeError: Argument \`suffix\` is not valid
+
+    :raises RuntimeError: Argument \`workers\` is not valid
+
+    For example:
+
+        >>> import pmisc
+        >>> with pmisc.TmpFiles(["Hello", None], suffix=".txt") as fnames:
+        ...     [open(fname).read() for fname in fnames]
+        ['Hello', '']
+    """
+
+    # pylint: disable=R0913
+    def __init__(
+        self,
+        specs,
+        workers=1,
+        suffix="",
+        dpath=None,
+        background=False,
+        backend="default",
+        binary=False,
+    ):  # noqa
+        if not isinstance(binary, bool):
+            raise RuntimeError("Argument `binary` is not valid")
+        if isinstance(specs, int) and (not isinstance(specs, bool)) and (specs >= 0):
+            specs = [None] * specs
+        elif isinstance(specs, (bool, int, str) + _BYTES_LIKE) or (
+            not hasattr(specs, "__iter__")
+        ):
+            raise RuntimeError("Argument `specs` is not valid")
+        specs = list(specs)
+        if any(
+            (spec is not None)
+            and (not callable(spec))
+            and _bad_contents(spec, binary)
+            for spec in specs
+        ):
+            raise RuntimeError("Argument `specs` is not valid")
+        if isinstance(workers, bool) or (not isinstance(workers, int)) or (workers < 1):
+            raise RuntimeError("Argument `workers` is not valid")
+        if (not isinstance(suffix, str)) or (os.sep in suffix) or ("/" in suffix):
+            raise RuntimeError("Argument `suffix` is not valid")
+        self._tmpdir = TmpDir(dpath, background=background, backend=backend)
+        self._specs = specs
+        self._workers = workers
+        self._suffix = suffix
+        self._binary = binary
+        self._fnames = None
+
+    def __enter__(self):  # noqa
+        dname = self._tmpdir.__enter__()
+        width = len(str(max(len(self._specs) - 1, 0)))
+        self._fnames = [
+            "{0}/{1:0{2}d}{3}".format(dname, num, width, self._suffix)
+            for num in range(len(self._specs))
+        ]
+        try:
+            if (self._workers == 1) or (len(self._specs) < 2):
+                for item in zip(self._fnames, self._specs):
+                    self._create(*item)
+            else:
+                # Imported here, it pulls in the logging module
+                # pylint: disable=C0415
+                from concurrent.futures import ThreadPoolExecutor
+
+                with ThreadPoolExecutor(min(self._workers, len(self._specs))) as pool:
+                    # Consume results so that exceptions are re-raised
+                    list(pool.map(self._create, self._fnames, self._specs))
+        except:
+            self.__exit__(None, None, None)
+            raise
+        return list(self._fnames)
+
+    def __exit__(self, exc_type, exc_value, exc_tb):  # noqa
+        self._tmpdir.__exit__(None, None, None)
+        return not exc_type is not None
+
+    def _create(self, fname, spec):
+        """Create and write file."""
+        if spec is None:
+            os.close(os.open(fname, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600))
+            return
+        with open(fname, "xb" if self._binary else "x") as fobj:
+            if callable(spec):
+                spec(fobj)
+            else:
+                _write_contents(fobj, spec)
+
+
+###
+# Module initialization
+###
+if hasattr(os, "register_at_fork"):  # pragma: no cover
+    os.register_at_fork(after_in_child=_cleanup_after_fork)
+    os.register_at_fork(after_in_child=_watchdog_after_fork)
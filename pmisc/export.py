@@ -0,0 +1,397 @@
+# export.py
+# Copyright (c) 2013-2020 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111,R0205,R0903
+
+# Standard library imports
+import abc
+import json
+import os
+import queue
+import re
+import socket
+import threading
+import time
+
+
+###
+# Functions
+###
+def _path_name(path, sep="/"):
+    """Return metric name of a timer call tree path."""
+    return path if isinstance(path, str) else sep.join(path)
+
+
+def _valid_num(value, int_only=False):
+    """Validate strictly positive number arguments."""
+    types = int if int_only else (int, float)
+    return (not isinstance(value, bool)) and isinstance(value, types) and (value > 0)
+
+
+###
+# Classes
+###
+class Exporter(object, metaclass=abc.ABCMeta):
+    r"""
+    Base class of non-blocking measurement exporters.
+
+    Measurements are submitted to a bounded queue, which the caller never
+    waits on; if the queue is full the measurement is dropped and counted.
+    A background thread drains the queue, aggregates measurements per name
+    and writes the aggregates every **interval** seconds. This is an
+    abstract class, sub-classes must implement the
+    :code:`_write(aggregates)` method (otherwise they cannot be
+    instantiated), where
+    :code:`aggregates` is a dictionary whose keys are metric names and whose
+    values are :code:`[count, sum, minimum, maximum]` lists (times in
+    nanoseconds) of the measurements received since the previous write
+
+    Exporters are started with :py:meth:`pmisc.Exporter.start` and stopped
+    (writing any pending measurements) with :py:meth:`pmisc.Exporter.stop`,
+    or used as context managers. Measurements of named
+    :py:class:`pmisc.Timer` objects are forwarded to exporters added to a
+    timer registry with :py:meth:`pmisc.TimerRegistry.add_exporter`
+
+    :param interval: Time between writes, in seconds
+    :type  interval: positive float
+
+    :param maxsize: Maximum number of queued measurements
+    :type  maxsize: positive integer
+
+    :raises RuntimeError: Argument \`interval\` is not valid
+    :raises RuntimeError: Argument \`maxsize\` is not valid
+    """
+
+    def __init__(self, interval=10.0, maxsize=10000):  # noqa
+        if not _valid_num(interval):
+            raise RuntimeError("Argument `interval` is not valid")
+        if not _valid_num(maxsize, int_only=True):
+            raise RuntimeError("Argument `maxsize` is not valid")
+        self._interval = interval
+        self._queue = queue.Queue(maxsize)
+        self._dropped = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def __enter__(self):  # noqa
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):  # noqa
+        self.stop()
+        return not exc_type is not None
+
+    def _drain(self, aggregates, timeout):
+        """Aggregate queued measurements, wait up to timeout seconds for the first."""
+        block = timeout > 0
+        while True:
+            try:
+                path, value, weight = self._queue.get(block, timeout)
+            except queue.Empty:
+                return
+            block = False
+            name = _path_name(path)
+            agg = aggregates.get(name)
+            if agg is None:
+                aggregates[name] = [weight, weight * value, value, value]
+            else:
+                agg[0] += weight
+                agg[1] += weight * value
+                agg[2] = min(agg[2], value)
+                agg[3] = max(agg[3], value)
+
+    def _run(self):
+        """Aggregate and write measurements until the exporter is stopped."""
+        stop = False
+        while not stop:
+            aggregates = {}
+            deadline = time.monotonic() + self._interval
+            while True:
+                stop = self._stop_event.is_set()
+                remaining = deadline - time.monotonic()
+                if stop or (remaining <= 0):
+                    break
+                self._drain(aggregates, min(remaining, 0.1))
+            self._drain(aggregates, 0)
+            self._write(aggregates)
+
+    @abc.abstractmethod
+    def _write(self, aggregates):
+        """Write measurement aggregates."""
+
+    def start(self):
+        """Start the background thread, if it is not running."""
+        if (self._thread is None) or (not self._thread.is_alive()):
+            self._stop_event.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="pmisc-{0}".format(type(self).__name__)
+            )
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background thread, writing any pending measurements."""
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, path, value, weight=1):
+        """
+        Queue a measurement, never blocks.
+
+        :param path: Metric name or timer call tree path
+        :type  path: string or tuple of strings
+
+        :param value: Measurement, in nanoseconds
+        :type  value: integer
+
+        :param weight: Number of measurements the measurement stands for
+        :type  weight: integer or float
+        """
+        try:
+            self._queue.put_nowait((path, value, weight))
+        except queue.Full:
+            self._dropped += 1
+
+    def _get_dropped(self):
+        return self._dropped
+
+    dropped = property(_get_dropped, doc="Number of dropped measurements")
+    """
+    Returns the number of measurements dropped because the queue was full
+
+    :rtype: integer
+    """
+
+
+class JsonLinesExporter(Exporter):
+    r"""
+    Append measurement aggregates to a JSON lines file.
+
+    See `<http://jsonlines.org/>`_. Each write appends one line per metric
+    name, with :code:`'time'` (seconds since the epoch), :code:`'name'`,
+    :code:`'count'`, :code:`'sum'`, :code:`'min'`, :code:`'max'` (times in
+    nanoseconds) and :code:`'dropped'` (cumulative number of dropped
+    measurements) keys
+
+    :param fname: File name
+    :type  fname: string
+
+    :param interval: Time between writes, in seconds
+    :type  interval: positive float
+
+    :param maxsize: Maximum number of queued measurements
+    :type  maxsize: positive integer
+
+    :raises RuntimeError: Argument \`fname\` is not valid
+    :raises RuntimeError: Argument \`interval\` is not valid
+    :raises RuntimeError: Argument \`maxsize\` is not valid
+    """
+
+    def __init__(self, fname, interval=10.0, maxsize=10000):  # noqa
+        if (not isinstance(fname, str)) or (not fname):
+            raise RuntimeError("Argument `fname` is not valid")
+        super(JsonLinesExporter, self).__init__(interval, maxsize)
+        self._fname = fname
+
+    def _write(self, aggregates):
+        if not aggregates:
+            return
+        now = time.time()
+        with open(self._fname, "a") as fobj:
+            for name in sorted(aggregates):
+                count, total, minv, maxv = aggregates[name]
+                fobj.write(
+                    json.dumps(
+                        {
+                            "time": now,
+                            "name": name,
+                            "count": count,
+                            "sum": total,
+                            "min": minv,
+                            "max": maxv,
+                            "dropped": self._dropped,
+                        },
+                        sort_keys=True,
+                    )
+                    + "\n"
+                )
+
+
+class PrometheusExporter(Exporter):
+    r"""
+    Write measurements to a Prometheus text exposition format file.
+
+    The file is suitable for the `Node exporter textfile collector
+    <https://github.com/prometheus/node_exporter#textfile-collector>`_ and is
+    atomically replaced on each write. Measurements are exported as a
+    summary (count and sum, in seconds, since the exporter was created)
+    with a :code:`name` label, and dropped measurements as a counter
+
+    :param fname: File name
+    :type  fname: string
+
+    :param metric: Metric name
+    :type  metric: string
+
+    :param interval: Time between writes, in seconds
+    :type  interval: positive float
+
+    :param maxsize: Maximum number of queued measurements
+    :type  maxsize: positive integer
+
+    :raises RuntimeError: Argument \`fname\` is not valid
+    :raises RuntimeError: Argument \`interval\` is not valid
+    :raises RuntimeError: Argument \`maxsize\` is not valid
+    :raises RuntimeError: Argument \`metric\` is not valid
+    """
+
+    def __init__(
+        self, fname, metric="pmisc_timer_seconds", interval=10.0, maxsize=10000
+    ):  # noqa
+        if (not isinstance(fname, str)) or (not fname):
+            raise RuntimeError("Argument `fname` is not valid")
+        if (not isinstance(metric, str)) or (
+            not re.match(r"^[a-zA-Z_:][a-zA-Z0-9_:]*$", metric)
+        ):
+            raise RuntimeError("Argument `metric` is not valid")
+        super(PrometheusExporter, self).__init__(interval, maxsize)
+        self._fname = fname
+        self._metric = metric
+        self._totals = {}
+
+    def _write(self, aggregates):
+        for name, (count, total, _, _) in aggregates.items():
+            ccount, ctotal = self._totals.get(name, (0, 0))
+            self._totals[name] = (ccount + count, ctotal + total)
+        lines = [
+            "# HELP {0} Duration of pmisc.Timer blocks".format(self._metric),
+            "# TYPE {0} summary".format(self._metric),
+        ]
+        for name in sorted(self._totals):
+            count, total = self._totals[name]
+            label = (
+                name.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+            )
+            lines.append(
+                '{0}_count{{name="{1}"}} {2}'.format(self._metric, label, count)
+            )
+            lines.append(
+                '{0}_sum{{name="{1}"}} {2!r}'.format(self._metric, label, total / 1e9)
+            )
+        lines += [
+            "# HELP {0}_dropped_total Measurements dropped".format(self._metric),
+            "# TYPE {0}_dropped_total counter".format(self._metric),
+            "{0}_dropped_total {1}".format(self._metric, self._dropped),
+        ]
+        tname = "{0}.{1}.tmp".format(self._fname, os.getpid())
+        with open(tname, "w") as fobj:
+            fobj.write("\n".join(lines) + "\n")
+        os.replace(tname, self._fname)
+
+
+class StatsdExporter(Exporter):
+    r"""
+    Send measurement aggregates to a StatsD server over UDP.
+
+    See `<https://github.com/statsd/statsd>`_. Each write sends, per metric
+    name, one timer (in milliseconds) with the mean of the measurements
+    received since the previous write and a sample rate of one over the
+    number of measurements, so that the server counts every measurement.
+    Metric names are the timer call tree paths with components separated by
+    periods. Dropped measurements are sent as the
+    :code:`[prefix]dropped` counter. Packets are kept under **packet_size**
+    bytes
+
+    :param host: Server host name or address
+    :type  host: string
+
+    :param port: Server port
+    :type  port: integer
+
+    :param prefix: Metric name prefix
+    :type  prefix: string
+
+    :param interval: Time between writes, in seconds
+    :type  interval: positive float
+
+    :param maxsize: Maximum number of queued measurements
+    :type  maxsize: positive integer
+
+    :param packet_size: Maximum UDP packet payload size, in bytes
+    :type  packet_size: positive integer
+
+    :raises RuntimeError: Argument \`host\` is not valid
+    :raises RuntimeError: Argument \`interval\` is not valid
+    :raises RuntimeError: Argument \`maxsize\` is not valid
+    :raises RuntimeError: Argument \`packet_size\` is not valid
+    :raises RuntimeError: Argument \`port\` is not valid
+    :raises RuntimeError: Argument \`prefix\` is not valid
+    """
+
+    # pylint: disable=R0913
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=8125,
+        prefix="",
+        interval=10.0,
+        maxsize=10000,
+        packet_size=1432,
+    ):  # noqa
+        if (not isinstance(host, str)) or (not host):
+            raise RuntimeError("Argument `host` is not valid")
+        if (not _valid_num(port, int_only=True)) or (port > 65535):
+            raise RuntimeError("Argument `port` is not valid")
+        if not isinstance(prefix, str):
+            raise RuntimeError("Argument `prefix` is not valid")
+        if not _valid_num(packet_size, int_only=True):
+            raise RuntimeError("Argument `packet_size` is not valid")
+        super(StatsdExporter, self).__init__(interval, maxsize)
+        self._address = (host, port)
+        self._prefix = prefix
+        self._packet_size = packet_size
+        self._sent_dropped = 0
+        self._sock = None
+
+    def _send(self, lines):
+        if self._sock is None:
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        packet = b""
+        for line in lines:
+            line = line.encode("utf-8")
+            if packet and (len(packet) + 1 + len(line) > self._packet_size):
+                self._sock.sendto(packet, self._address)
+                packet = b""
+            packet = (packet + b"\n" + line) if packet else line
+        if packet:
+            self._sock.sendto(packet, self._address)
+
+    def _write(self, aggregates):
+        lines = []
+        for name in sorted(aggregates):
+            count, total, _, _ = aggregates[name]
+            name = re.sub(r"[:|@\s]", "_", _path_name(name, "/").replace("/", "."))
+            line = "{0}{1}:{2:.6f}|ms".format(self._prefix, name, total / 1e6 / count)
+            if count > 1:
+                line += "|@{0:.6g}".format(1.0 / count)
+            lines.append(line)
+        dropped = self._dropped
+        if dropped > self._sent_dropped:
+            lines.append(
+                "{0}dropped:{1}|c".format(self._prefix, dropped - self._sent_dropped)
+            )
+            self._sent_dropped = dropped
+        if lines:
+            try:
+                self._send(lines)
+            except OSError:  # pragma: no cover
+                pass
+
+    def stop(self):
+        """Stop the background thread, writing any pending measurements."""
+        super(StatsdExporter, self).stop()
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
@@ -0,0 +1,758 @@
+# prof.py
+# Copyright (c) 2013-2020 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111,R0205,R0902,R0903
+
+# Standard library imports
+from __future__ import print_function
+import cProfile
+import collections
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+
+try:  # pragma: no cover
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+
+###
+# Global variables
+###
+_MEM_LOCK = threading.Lock()
+_PROFILE_SORTS = {"cumulative": 3, "total": 2}
+# Active Profile object, the profiler of the interpreter cannot be shared
+_PROFILE_LOCK = threading.Lock()
+_PROFILE = [None]
+# Resource usage fields and the getrusage() attributes they are computed from
+_RUSAGE_FIELDS = (
+    ("user_time", "ru_utime"),
+    ("system_time", "ru_stime"),
+    ("minor_faults", "ru_minflt"),
+    ("major_faults", "ru_majflt"),
+    ("voluntary_switches", "ru_nvcsw"),
+    ("involuntary_switches", "ru_nivcsw"),
+    ("block_inputs", "ru_inblock"),
+    ("block_outputs", "ru_oublock"),
+)
+# ru_maxrss is in bytes in macOS and in kilobytes in other platforms
+_MAXRSS_UNIT = 1 if sys.platform == "darwin" else 1024
+# Active MemTrace objects and whether tracemalloc was started by them
+_MEM_TRACES = []
+_MEM_STARTED = [False]
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+###
+# Functions
+###
+def _fold_peak():
+    """Record the tracemalloc peak in the active traces, then reset it."""
+    # pylint: disable=W0212
+    peak = tracemalloc.get_traced_memory()[1]
+    for obj in _MEM_TRACES:
+        obj._max_traced = max(obj._max_traced, peak)
+    if hasattr(tracemalloc, "reset_peak"):
+        tracemalloc.reset_peak()
+
+
+def _label(code):
+    """Return collapsed stack label of a code object."""
+    return "{0} ({1}:{2})".format(code.co_name, code.co_filename, code.co_firstlineno)
+
+
+def _rss():
+    """Return resident set size in bytes, None if not available."""
+    try:
+        with open("/proc/self/statm", "rb") as fobj:
+            return int(fobj.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):  # pragma: no cover
+        return None
+
+
+###
+# Classes
+###
+class MemTrace(object):
+    r"""
+    Trace memory allocations of code blocks.
+
+    Uses the :py:mod:`tracemalloc` module, which is started (and stopped)
+    by the context manager if it is not already tracing; when it is, the
+    overhead of the context manager is a few calls to
+    :py:func:`tracemalloc.get_traced_memory`. Context managers can be nested,
+    the peak of an outer block includes the peaks of the inner blocks
+
+    :param top: Number of source lines that allocated the most memory in the
+                block to report, see :py:attr:`pmisc.MemTrace.top`. Taking
+                the snapshots required is slow, 0 disables the report
+    :type  top: non-negative integer
+
+    :param nframes: Number of frames stored per allocation traceback, if
+                    tracemalloc is started by the context manager
+    :type  nframes: positive integer
+
+    :returns: :py:class:`pmisc.MemTrace`
+
+    :raises RuntimeError: Argument \`nframes\` is not valid
+    :raises RuntimeError: Argument \`top\` is not valid
+
+    For example:
+
+        >>> import pmisc
+        >>> with pmisc.MemTrace() as mobj:
+        ...     data = [0] * 100000
+        >>> mobj.net >= 800000
+        True
+        >>> mobj.peak >= mobj.net
+        True
+    """
+
+    def __init__(self, top=0, nframes=1):  # noqa
+        if isinstance(top, bool) or (not isinstance(top, int)) or (top < 0):
+            raise RuntimeError("Argument `top` is not valid")
+        if (
+            isinstance(nframes, bool)
+            or (not isinstance(nframes, int))
+            or (nframes < 1)
+        ):
+            raise RuntimeError("Argument `nframes` is not valid")
+        self._top_num = top
+        self._nframes = nframes
+        self._start_traced = None
+        self._start_rss = None
+        self._max_traced = 0
+        self._snapshot = None
+        self._peak = None
+        self._net = None
+        self._rss_delta = None
+        self._top = None
+
+    def __enter__(self):  # noqa
+        with _MEM_LOCK:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self._nframes)
+                _MEM_STARTED[0] = True
+            _fold_peak()
+            self._start_traced = tracemalloc.get_traced_memory()[0]
+            self._max_traced = self._start_traced
+            _MEM_TRACES.append(self)
+        self._snapshot = tracemalloc.take_snapshot() if self._top_num else None
+        self._start_rss = _rss()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):  # noqa
+        rss = _rss()
+        if self._snapshot is not None:
+            stats = tracemalloc.take_snapshot().compare_to(self._snapshot, "lineno")
+            self._top = [
+                (str(stat.traceback), stat.size_diff, stat.count_diff)
+                for stat in stats[: self._top_num]
+            ]
+            self._snapshot = None
+        with _MEM_LOCK:
+            _fold_peak()
+            current = tracemalloc.get_traced_memory()[0]
+            _MEM_TRACES.remove(self)
+            if _MEM_STARTED[0] and (not _MEM_TRACES):
+                tracemalloc.stop()
+                _MEM_STARTED[0] = False
+        self._peak = max(self._max_traced - self._start_traced, 0)
+        self._net = current - self._start_traced
+        self._rss_delta = (
+            None if None in (rss, self._start_rss) else rss - self._start_rss
+        )
+        return not exc_type is not None
+
+    def _get_net(self):
+        return self._net
+
+    def _get_peak(self):
+        return self._peak
+
+    def _get_rss(self):
+        return self._rss_delta
+
+    def _get_top(self):
+        return self._top
+
+    net = property(_get_net, doc="Net allocated memory")
+    """
+    Returns the memory (in bytes) allocated in the block and not freed by the
+    end of the block; negative if the block freed more memory than it
+    allocated
+
+    :rtype: integer
+    """
+
+    peak = property(_get_peak, doc="Peak allocated memory")
+    """
+    Returns the peak memory (in bytes) allocated in the block, relative to the
+    memory allocated at the start of the block. In Python versions older than
+    3.9 this is an upper bound when tracemalloc was already tracing when the
+    outermost context manager was entered
+
+    :rtype: integer
+    """
+
+    rss = property(_get_rss, doc="Resident set size change")
+    """
+    Returns the change (in bytes) of the process resident set size, from
+    :code:`/proc/self/statm`. None if not available
+
+    :rtype: integer or None
+    """
+
+    top = property(_get_top, doc="Top allocation sites")
+    """
+    Returns the source lines that allocated the most memory in the block, as
+    a list of (*location*, *size*, *count*) tuples, where *location* is a
+    :code:`'file:line'` string, *size* the net allocated memory (in bytes)
+    and *count* the net number of allocated memory blocks. None if the
+    report was not requested
+
+    :rtype: list of tuples or None
+    """
+
+
+class Profile(object):
+    r"""
+    Deterministic profile of code blocks.
+
+    The :py:mod:`cProfile` profiler is enabled only within the block. The
+    profile can be summarized in a table of the functions that took the
+    most time (see :py:meth:`pmisc.Profile.report`), optionally restricted to
+    functions defined in files under given directories, and saved to a file
+    that can be loaded with :py:class:`pstats.Stats` and other profile
+    viewers. Only one profile can be active at a time, entering a profile
+    while another one is active (a nested profile, for example) raises an
+    exception
+
+    :param top: Maximum number of functions reported
+    :type  top: positive integer
+
+    :param sort: Report sort order, :code:`'cumulative'` (time spent in the
+                 function and the functions it calls) or :code:`'total'`
+                 (time spent in the function itself)
+    :type  sort: string
+
+    :param paths: Directories (or files) the reported functions are defined
+                  under. If None all functions are reported
+    :type  paths: string, list of strings or None
+
+    :param fname: File to dump the profile statistics to upon exit
+    :type  fname: string or None
+
+    :param verbose: Flag that indicates whether the report is printed upon
+                    exit (True) or not (False)
+    :type  verbose: boolean
+
+    :returns: :py:class:`pmisc.Profile`
+
+    :raises RuntimeError: Argument \`fname\` is not valid
+    :raises RuntimeError: Argument \`paths\` is not valid
+    :raises RuntimeError: Argument \`sort\` is not valid
+    :raises RuntimeError: Argument \`top\` is not valid
+    :raises RuntimeError: Argument \`verbose\` is not valid
+    :raises RuntimeError: Another profile is active
+
+    For example:
+
+        >>> import pmisc
+        >>> def func():
+        ...     return sum(range(1000))
+        >>> with pmisc.Profile(top=5, sort="total") as pobj:
+        ...     _ = [func() for _ in range(100)]
+        >>> pobj.report().splitlines()[0].split()
+        ['Function', 'calls', 'total', 'cumulative']
+    """
+
+    # pylint: disable=R0913
+    def __init__(
+        self, top=20, sort="cumulative", paths=None, fname=None, verbose=False
+    ):  # noqa
+        if isinstance(top, bool) or (not isinstance(top, int)) or (top < 1):
+            raise RuntimeError("Argument `top` is not valid")
+        if (not isinstance(sort, str)) or (sort not in _PROFILE_SORTS):
+            raise RuntimeError("Argument `sort` is not valid")
+        paths = [paths] if isinstance(paths, str) else paths
+        if (paths is not None) and (
+            (not isinstance(paths, (list, tuple)))
+            or (not paths)
+            or any((not isinstance(item, str)) or (not item) for item in paths)
+        ):
+            raise RuntimeError("Argument `paths` is not valid")
+        if (fname is not None) and ((not isinstance(fname, str)) or (not fname)):
+            raise RuntimeError("Argument `fname` is not valid")
+        if not isinstance(verbose, bool):
+            raise RuntimeError("Argument `verbose` is not valid")
+        self._top = top
+        self._sort = sort
+        self._paths = (
+            None
+            if paths is None
+            else tuple(os.path.normcase(os.path.abspath(item)) for item in paths)
+        )
+        self._fname = fname
+        self._verbose = verbose
+        self._profiler = None
+        self._stats = None
+
+    def __enter__(self):  # noqa
+        with _PROFILE_LOCK:
+            if _PROFILE[0] is not None:
+                raise RuntimeError("Another profile is active")
+            _PROFILE[0] = self
+        self._stats = None
+        self._profiler = cProfile.Profile()
+        try:
+            self._profiler.enable()
+        except:
+            self._profiler = None
+            _PROFILE[0] = None
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):  # noqa
+        self._profiler.disable()
+        _PROFILE[0] = None
+        self._stats = pstats.Stats(self._profiler)
+        self._profiler = None
+        if self._fname is not None:
+            self._stats.dump_stats(self._fname)
+        if self._verbose:
+            print(self.report())
+        return not exc_type is not None
+
+    def _selected(self, fname):
+        """Return True if functions defined in a file are reported."""
+        fname = os.path.normcase(os.path.abspath(fname))
+        return any(
+            (fname == path) or fname.startswith(path.rstrip(os.sep) + os.sep)
+            for path in self._paths
+        )
+
+    def report(self):
+        """
+        Return a report of the functions that took the most time.
+
+        For each function the number of calls, the time spent in the function
+        itself (*total*) and the time spent in the function and the functions
+        it calls (*cumulative*) are reported, in milliseconds. Functions are
+        labeled as :code:`'function (file:line)'`, where *line* is the first
+        line of the function. Empty if the profile has not been run
+
+        :rtype: string
+        """
+        if self._stats is None:
+            return ""
+        rows = [
+            (func, values)
+            for func, values in self._stats.stats.items()
+            if (self._paths is None) or ((func[0] != "~") and self._selected(func[0]))
+        ]
+        col = _PROFILE_SORTS[self._sort]
+        rows = sorted(rows, key=lambda item: -item[1][col])[: self._top]
+        labels = [
+            name if fname == "~" else "{0} ({1}:{2})".format(name, fname, line)
+            for (fname, line, name), _ in rows
+        ]
+        cols = ["calls", "total", "cumulative"]
+        width = max([len("Function")] + [len(label) for label in labels])
+        template = "{0:<" + str(width) + "}" + "".join(
+            " {" + str(num + 1) + ":>10}" for num, _ in enumerate(cols)
+        )
+        lines = [template.format("Function", *cols)]
+        for label, (_, (_, ncalls, ttime, ctime, _)) in zip(labels, rows):
+            lines.append(
+                template.format(
+                    label,
+                    ncalls,
+                    "{0:.3f}".format(1e3 * ttime),
+                    "{0:.3f}".format(1e3 * ctime),
+                )
+            )
+        return os.linesep.join(lines)
+
+    def _get_stats(self):
+        return self._stats
+
+    stats = property(_get_stats, doc="Profile statistics")
+    """
+    Returns the profile statistics, None if the profile has not been run
+
+    :rtype: :py:class:`pstats.Stats` or None
+    """
+
+
+class ResourceUsage(object):
+    r"""
+    Measure operating system resource usage of code blocks.
+
+    Reports the change of the counters returned by
+    :py:func:`resource.getrusage` between the context manager entry and exit
+    time points: CPU time, page faults, context switches and block
+    input/output operations, which often explain why a block took longer
+    than expected. Only available in platforms with the :py:mod:`resource`
+    module (Unix)
+
+    :param scope: Usage measured, :code:`'process'` (all threads of the
+                  process) or :code:`'thread'` (calling thread, in platforms
+                  that support it, for example Linux)
+    :type  scope: string
+
+    :returns: :py:class:`pmisc.ResourceUsage`
+
+    :raises RuntimeError: Argument \`scope\` is not valid
+
+    :raises RuntimeError: Resource usage is not supported in this platform
+
+    For example:
+
+        >>> import pmisc
+        >>> with pmisc.ResourceUsage(scope="thread") as robj:
+        ...     _ = sum(range(1000000))
+        >>> robj.user_time + robj.system_time > 0
+        True
+    """
+
+    def __init__(self, scope="process"):  # noqa
+        if resource is None:  # pragma: no cover
+            raise RuntimeError("Resource usage is not supported in this platform")
+        scopes = {"process": resource.RUSAGE_SELF}
+        if hasattr(resource, "RUSAGE_THREAD"):
+            scopes["thread"] = resource.RUSAGE_THREAD
+        if (not isinstance(scope, str)) or (scope not in scopes):
+            raise RuntimeError("Argument `scope` is not valid")
+        self._who = scopes[scope]
+        self._start = None
+        self._usage = dict((name, None) for name, _ in _RUSAGE_FIELDS)
+        self._max_rss = None
+
+    def __enter__(self):  # noqa
+        self._start = resource.getrusage(self._who)
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):  # noqa
+        usage = resource.getrusage(self._who)
+        for name, attr in _RUSAGE_FIELDS:
+            self._usage[name] = getattr(usage, attr) - getattr(self._start, attr)
+        self._max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        self._max_rss *= _MAXRSS_UNIT
+        self._start = None
+        return not exc_type is not None
+
+    def _get_block_inputs(self):
+        return self._usage["block_inputs"]
+
+    def _get_block_outputs(self):
+        return self._usage["block_outputs"]
+
+    def _get_involuntary_switches(self):
+        return self._usage["involuntary_switches"]
+
+    def _get_major_faults(self):
+        return self._usage["major_faults"]
+
+    def _get_max_rss(self):
+        return self._max_rss
+
+    def _get_minor_faults(self):
+        return self._usage["minor_faults"]
+
+    def _get_system_time(self):
+        return self._usage["system_time"]
+
+    def _get_user_time(self):
+        return self._usage["user_time"]
+
+    def _get_voluntary_switches(self):
+        return self._usage["voluntary_switches"]
+
+    block_inputs = property(_get_block_inputs, doc="Block input operations")
+    """
+    Returns the number of times the file system had to read from disk in the
+    block. None if the context manager has not been used
+
+    :rtype: integer or None
+    """
+
+    block_outputs = property(_get_block_outputs, doc="Block output operations")
+    """
+    Returns the number of times the file system had to write to disk in the
+    block. None if the context manager has not been used
+
+    :rtype: integer or None
+    """
+
+    involuntary_switches = property(
+        _get_involuntary_switches, doc="Involuntary context switches"
+    )
+    """
+    Returns the number of times the block was switched out by the scheduler
+    because a higher priority task became runnable or its time slice was
+    exhausted (CPU contention). None if the context manager has not been used
+
+    :rtype: integer or None
+    """
+
+    major_faults = property(_get_major_faults, doc="Major page faults")
+    """
+    Returns the number of page faults in the block that required input/output
+    (pages read from disk or swap). None if the context manager has not been
+    used
+
+    :rtype: integer or None
+    """
+
+    max_rss = property(_get_max_rss, doc="Maximum resident set size")
+    """
+    Returns the maximum resident set size (in bytes) of the process since it
+    started, up to the end of the block, regardless of the scope. None if the
+    context manager has not been used
+
+    :rtype: integer or None
+    """
+
+    minor_faults = property(_get_minor_faults, doc="Minor page faults")
+    """
+    Returns the number of page faults in the block that did not require
+    input/output (for example first access to newly allocated memory). None
+    if the context manager has not been used
+
+    :rtype: integer or None
+    """
+
+    system_time = property(_get_system_time, doc="System CPU time")
+    """
+    Returns the CPU time (in seconds) spent in the operating system kernel on
+    behalf of the block. None if the context manager has not been used
+
+    :rtype: float or None
+    """
+
+    user_time = property(_get_user_time, doc="User CPU time")
+    """
+    Returns the CPU time (in seconds) spent executing the block in user mode.
+    None if the context manager has not been used
+
+    :rtype: float or None
+    """
+
+    voluntary_switches = property(
+        _get_voluntary_switches, doc="Voluntary context switches"
+    )
+    """
+    Returns the number of times the block gave up the CPU voluntarily, for
+    example to wait for input/output or a lock. None if the context manager
+    has not been used
+
+    :rtype: integer or None
+    """
+
+
+class SampleProfiler(object):
+    r"""
+    Statistical profiler of code blocks.
+
+    A background thread samples the call stack of the profiled threads
+    (obtained with :py:func:`sys._current_frames`) every **interval**
+    seconds and counts how many times each stack is seen. No code runs in
+    the profiled threads, so the overhead is the sampling itself, which takes
+    a few microseconds per thread at each sample; at the default interval it
+    is low enough to profile production workers for long periods of time.
+    Functions that use most of the time are those that show up in most
+    samples
+
+    The samples can be exported as collapsed stacks (see
+    :py:meth:`pmisc.SampleProfiler.collapsed`), the input format of
+    `FlameGraph <https://github.com/brendangregg/FlameGraph>`_ and other
+    flame graph viewers, or summarized per function (see
+    :py:meth:`pmisc.SampleProfiler.report`)
+
+    :param interval: Time between samples, in seconds
+    :type  interval: positive float
+
+    :param all_threads: Flag that indicates whether all threads are profiled
+                        (True) or only the thread that entered the context
+                        manager (False). With all threads each stack starts
+                        with the thread name
+    :type  all_threads: boolean
+
+    :param max_depth: Maximum number of (innermost) frames kept per stack
+    :type  max_depth: positive integer
+
+    :returns: :py:class:`pmisc.SampleProfiler`
+
+    :raises RuntimeError: Argument \`all_threads\` is not valid
+    :raises RuntimeError: Argument \`interval\` is not valid
+    :raises RuntimeError: Argument \`max_depth\` is not valid
+
+    For example:
+
+        >>> import pmisc
+        >>> def busy():
+        ...     return sum(range(10000))
+        >>> with pmisc.SampleProfiler(interval=0.001) as pobj:
+        ...     while pobj.samples < 10:
+        ...         _ = busy()
+        >>> "busy" in pobj.collapsed()
+        True
+    """
+
+    def __init__(self, interval=0.01, all_threads=False, max_depth=128):  # noqa
+        if (
+            isinstance(interval, bool)
+            or (not isinstance(interval, (int, float)))
+            or (interval <= 0)
+        ):
+            raise RuntimeError("Argument `interval` is not valid")
+        if not isinstance(all_threads, bool):
+            raise RuntimeError("Argument `all_threads` is not valid")
+        if (
+            isinstance(max_depth, bool)
+            or (not isinstance(max_depth, int))
+            or (max_depth < 1)
+        ):
+            raise RuntimeError("Argument `max_depth` is not valid")
+        self._interval = interval
+        self._all_threads = all_threads
+        self._max_depth = max_depth
+        self._counts = collections.Counter()
+        self._samples = 0
+        self._tid = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def __enter__(self):  # noqa
+        self._tid = threading.get_ident()
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="pmisc-SampleProfiler"
+        )
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):  # noqa
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        return not exc_type is not None
+
+    def _run(self):
+        """Sample stacks until the profiler is stopped."""
+        own = threading.get_ident()
+        names = {}
+        while not self._stop_event.wait(self._interval):
+            frames = sys._current_frames()  # pylint: disable=W0212
+            if not self._all_threads:
+                frames = {self._tid: frames.get(self._tid)}
+            for tid, frame in frames.items():
+                if (tid == own) or (frame is None):
+                    continue
+                stack = []
+                while (frame is not None) and (len(stack) < self._max_depth):
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                if self._all_threads:
+                    if tid not in names:
+                        names = dict(
+                            (thread.ident, thread.name)
+                            for thread in threading.enumerate()
+                        )
+                    stack.append(names.get(tid, str(tid)))
+                self._counts[tuple(stack)] += 1
+            self._samples += 1
+
+    def _labeled(self):
+        """Return sample counts of stacks of labels, outermost frame first."""
+        labels = {}
+        ret = collections.Counter()
+        for stack, count in list(self._counts.items()):
+            items = []
+            for item in reversed(stack):
+                if isinstance(item, str):
+                    items.append(item)
+                    continue
+                if item not in labels:
+                    labels[item] = _label(item)
+                items.append(labels[item])
+            ret[tuple(items)] += count
+        return ret
+
+    def collapsed(self):
+        """
+        Return the sampled stacks in the collapsed stack format.
+
+        Each line is a stack, with frames separated by semicolons from the
+        outermost to the innermost, followed by a space and the number of
+        samples in which the stack was seen. Frames are labeled as
+        :code:`'function (file:line)'`, where *line* is the first line of the
+        function
+
+        :rtype: string
+        """
+        stacks = self._labeled()
+        return "".join(
+            "{0} {1}\n".format(";".join(stack), count)
+            for stack, count in sorted(stacks.items())
+        )
+
+    def report(self, top=10):
+        r"""
+        Return a report of the functions that appear in most samples.
+
+        For each function the number of samples in which it was the innermost
+        frame (*self*) and in which it was in the stack (*total*) are
+        reported, as counts and percentages of the samples of the profiled
+        threads, sorted by decreasing *self* samples
+
+        :param top: Maximum number of functions reported
+        :type  top: positive integer
+
+        :rtype: string
+
+        :raises RuntimeError: Argument \`top\` is not valid
+        """
+        if isinstance(top, bool) or (not isinstance(top, int)) or (top < 1):
+            raise RuntimeError("Argument `top` is not valid")
+        stacks = self._labeled()
+        nself = collections.Counter()
+        ntotal = collections.Counter()
+        for stack, count in stacks.items():
+            nself[stack[-1]] += count
+            for label in set(stack):
+                ntotal[label] += count
+        nsamples = max(sum(stacks.values()), 1)
+        rows = sorted(nself.items(), key=lambda item: (-item[1], item[0]))[:top]
+        cols = ["self", "self%", "total", "total%"]
+        width = max([len("Function")] + [len(label) for label, _ in rows])
+        template = "{0:<" + str(width) + "}" + "".join(
+            " {" + str(num + 1) + ":>8}" for num, _ in enumerate(cols)
+        )
+        lines = [template.format("Function", *cols)]
+        for label, count in rows:
+            lines.append(
+                template.format(
+                    label,
+                    count,
+                    "{0:.1f}".format(100.0 * count / nsamples),
+                    ntotal[label],
+                    "{0:.1f}".format(100.0 * ntotal[label] / nsamples),
+                )
+            )
+        return os.linesep.join(lines)
+
+    def _get_samples(self):
+        return self._samples
+
+    samples = property(_get_samples, doc="Number of samples")
+    """
+    Returns the number of samples taken
+
+    :rtype: integer
+    """
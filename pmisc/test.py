@@ -45,62 +45,42 @@ def _ex_type_str(exobj):
     return exc_type
 
 
-def _get_trap(func, exc):  # pragma: no cover
-    """Find a line in a function with a simple source file parser."""
-    debug = False
-    ntokens = 2
-    fname = "pmisc{0}test.py".format(os.sep)
-    src = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test.py")
-    with open(src) as fobj:
-        lines = [line.rstrip() for line in fobj.readlines()]
-    if debug:
-        print(lines)
-    in_func = False
-    exc_lnum = None
-    if debug:
-        print("Function: {0}, trigger: {1}".format(func, exc))
-    for lnum, line in enumerate(lines):
-        if in_func:
-            if debug:
-                print("   {0}".format(line))
-            if line.strip() == exc.strip():
-                exc_lnum = lnum
-                break
-            if line.startswith("def "):
-                break
-        else:
-            if debug:
-                print(line)
-            in_func = line.startswith("def {0}".format(func))
-    if exc_lnum is None:
-        raise RuntimeError(
-            "Exception raising line could not be found ({0}, {1})".format(func, exc)
-        )
-    return (ntokens, fname, exc_lnum + 1, func, exc)
-
-
 _ORIG_EXCEPTHOOK = sys.__excepthook__
+# Exception "traps", lines in this module where exceptions that are meant to
+# be reported at the caller's frame are raised. Each line is given by its
+# offset from the first line of the function that contains it, so that the
+# traps can be resolved from the function code objects without reading the
+# module source file (this module may be installed in a zip file or as
+# byte-compiled files only). The line text is kept for the test suite to
+# verify the offsets and for the traceback comparison
 _EXC_TRAPS_INFO = [
-    ("_raise_if_not_raised", 'raise AssertionError(exmsg or "Did not raise")'),
-    ("assert_arg_invalid", "**kwargs"),
-    ("assert_exception", "_raise_if_not_raised(eobj)"),
-    ("assert_exception", "_raise_exception_mismatch(eobj, extype, exmsg)"),
-    ("assert_exception", "_raise_exception_mismatch(excinfo, extype, exmsg)"),
-    ("assert_prop", "_raise_if_not_raised(eobj)"),
-    ("assert_prop", "_raise_exception_mismatch(eobj, extype, exmsg)"),
-    ("assert_prop", "_raise_exception_mismatch(excinfo, extype, exmsg)"),
-    ("assert_ro_prop", 'raise TypeError("Property name must be a string")'),
-    ("assert_ro_prop", 'raise ValueError("Empty property name")'),
-    ("assert_ro_prop", 'raise AttributeError("Object does not have property")'),
-    ("assert_ro_prop", "_raise_exception_mismatch(eobj, extype, exmsg)"),
-    ("assert_ro_prop", "_raise_exception_mismatch(excinfo, extype, exmsg)"),
-    ("assert_ro_prop", 'raise AssertionError("Property can be deleted")'),
+    ("_raise_if_not_raised", 3, 'raise AssertionError(exmsg or "Did not raise")'),
+    ("assert_arg_invalid", 27, "**kwargs"),
+    ("assert_exception", 62, "_raise_if_not_raised(eobj)"),
+    ("assert_exception", 63, "_raise_exception_mismatch(eobj, extype, exmsg)"),
+    ("assert_exception", 65, "_raise_exception_mismatch(excinfo, extype, exmsg)"),
+    ("assert_prop", 33, "_raise_if_not_raised(eobj)"),
+    ("assert_prop", 34, "_raise_exception_mismatch(eobj, extype, exmsg)"),
+    ("assert_prop", 35, "_raise_exception_mismatch(excinfo, extype, exmsg)"),
+    ("assert_ro_prop", 11, 'raise TypeError("Property name must be a string")'),
+    ("assert_ro_prop", 13, 'raise ValueError("Empty property name")'),
+    ("assert_ro_prop", 15, 'raise AttributeError("Object does not have property")'),
+    ("assert_ro_prop", 25, "_raise_exception_mismatch(eobj, extype, exmsg)"),
+    ("assert_ro_prop", 21, "_raise_exception_mismatch(excinfo, extype, exmsg)"),
+    ("assert_ro_prop", 27, 'raise AssertionError("Property can be deleted")'),
     (
         "compare_strings",
+        91,
         'raise AssertionError("Strings do not match" + os.linesep + ret)',
     ),
 ]
-_EXC_TRAPS = [_get_trap(*exc_def) for exc_def in _EXC_TRAPS_INFO]
+# Populated at the end of the module, once all trap functions are defined.
+# _EXC_TRAPS_INDEX maps (line number, function name) to the trailing file
+# name components of the trap, so that each traceback entry can be checked
+# with a single dictionary look-up
+_EXC_TRAPS = []
+_EXC_TRAPS_INDEX = {}
+
 
 ###
 # Helper functions
@@ -138,7 +118,7 @@ def _del_pmisc_test_frames(excinfo):
 
         traceback = property(_get_traceback, _set_traceback)
 
-    offset = _find_test_module_frame(traceback.extract_tb(excinfo._excinfo[2]))
+    offset = _find_test_module_frame(_walk_tb(excinfo._excinfo[2]))
     if offset:
         return PmiscExceptionInfo(excinfo, offset)
     return excinfo
@@ -151,10 +131,10 @@ def _eprint(msg):  # pragma: no cover
 
 def _excepthook(exc_type, exc_value, exc_traceback):
     """Remove unwanted traceback elements past a given specific module call."""
-    tbs = traceback.extract_tb(exc_traceback)
-    offset = _find_test_module_frame(tbs)
+    offset = _find_test_module_frame(_walk_tb(exc_traceback))
     if not offset:
         _ORIG_EXCEPTHOOK(exc_type, exc_value, exc_traceback)
+        return
     new_tb = _process_tb(exc_traceback, offset)
     if new_tb:
         exc_traceback = new_tb[0]
@@ -170,29 +150,16 @@ def _excepthook(exc_type, exc_value, exc_traceback):
     _eprint(lines)
 
 
-def _find_test_module_frame(tbs):  # noqa: D202
+def _find_test_module_frame(tbs):
     """Find the first pmisc.test module frame in Pytest excinfo structure."""
-
-    def make_test_tuple(tbt, ntokens=1):
-        """Create exception comparison tuple."""
-        fname, line, func, exc = tbt
-        fname = os.sep.join(fname.split(os.sep)[-ntokens:])
-        return (fname, line, func, exc)
-
-    offset = 0
+    # The source line text is not compared, it is not available when the
+    # package is installed as a zip file or as byte-compiled files only
     for num, item in enumerate(tbs):
-        found = False
-        for trap in _EXC_TRAPS:
-            ntokens = trap[0]
-            ref = make_test_tuple(trap[1:], ntokens)
-            fname, line, func, exc = make_test_tuple(item, ntokens)
-            if (fname, line, func, exc) == ref:
-                offset = num
-                found = True
-                break
-        if found:
-            break
-    return offset
+        fname, line, func = item[:3]
+        tail = _EXC_TRAPS_INDEX.get((line, func))
+        if (tail is not None) and ((fname == tail) or fname.endswith(os.sep + tail)):
+            return num
+    return 0
 
 
 def _get_fargs(func, no_self=False, no_varargs=False):  # pragma: no cover
@@ -358,6 +325,15 @@ def _stop_tracing():
     return tracing
 
 
+def _walk_tb(trbk):
+    """Yield file name, line number and function name of traceback entries."""
+    # Cheaper than traceback.extract_tb, which also looks up source lines
+    while trbk:
+        code = trbk.tb_frame.f_code
+        yield (code.co_filename, trbk.tb_lineno, code.co_name)
+        trbk = trbk.tb_next
+
+
 ###
 # Helper classes
 ###
@@ -696,3 +672,16 @@ def get_exmsg(exobj):  # pragma: no cover
         exobj = exobj._excinfo[1]
         return exobj.args[0]
     return msg
+
+
+###
+# Module initialization
+###
+def _get_trap(func, offset, exc):
+    """Resolve an exception trap line number from the function code object."""
+    lnum = globals()[func].__code__.co_firstlineno + offset
+    return (2, "pmisc{0}test.py".format(os.sep), lnum, func, exc)
+
+
+_EXC_TRAPS[:] = [_get_trap(*exc_def) for exc_def in _EXC_TRAPS_INFO]
+_EXC_TRAPS_INDEX.update(((lnum, func), fname) for _, fname, lnum, func, _ in _EXC_TRAPS)
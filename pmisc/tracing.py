@@ -0,0 +1,273 @@
+# tracing.py
+# Copyright (c) 2013-2020 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111,R0205,R0902,R0903
+
+# Standard library imports
+import collections
+import itertools
+import json
+import os
+import threading
+import time
+
+
+###
+# Global variables
+###
+_ACTIVE_LOCK = threading.Lock()
+# Trace recorder timers send their events to, if any
+_RECORDER = [None]
+# Identifiers of asynchronous laps, their begin and end events are matched by
+# identifier and not by thread
+_TRACE_IDS = itertools.count(1)
+_THREAD_ID = getattr(threading, "get_native_id", threading.get_ident)
+_CLOCK = getattr(time, "perf_counter_ns", None) or (
+    lambda: int(time.perf_counter() * 1e9)
+)
+
+
+###
+# Functions
+###
+def _event(pid, phase, name, tstamp, tid, args=None, aid=None):
+    """Return a trace event dictionary."""
+    event = {
+        "name": name,
+        "cat": "pmisc",
+        "ph": phase,
+        "ts": tstamp / 1e3,
+        "pid": pid,
+        "tid": tid,
+    }
+    if args:
+        event["args"] = args
+    if aid is not None:
+        event["id"] = aid
+    return event
+
+
+###
+# Classes
+###
+class TraceRecorder(object):
+    r"""
+    Record a timeline of timer blocks in Trace Event Format.
+
+    See the `Trace Event Format
+    <https://docs.google.com/document/d/
+    1CvAfd4DXoDk5mVJTBjBVd2pEVZcnBvMgPbCGeJLa0Oy4vAQ>`_ specification. The
+    recorded traces can be opened in `Perfetto <https://ui.perfetto.dev>`_ or
+    :code:`chrome://tracing`
+
+    While a recorder is active (between :py:meth:`pmisc.TraceRecorder.start`
+    and :py:meth:`pmisc.TraceRecorder.stop` calls, or as a context manager)
+    every lap of a named :py:class:`pmisc.Timer` object generates a begin and
+    an end event, with the timer call tree path as an argument. Laps of
+    asynchronous context managers generate asynchronous begin and end
+    events, which are matched by identifier, so that concurrent tasks on the
+    same thread are shown as separate tracks. Only one recorder can be active
+    at a time
+
+    Events are kept in a ring buffer of at most **maxsize** events; when the
+    buffer is full the oldest event is dropped and counted. If **fname** is
+    not None the events are streamed to a file by a background thread every
+    **interval** seconds, in the JSON array format, so that long runs do not
+    have to fit in memory. Otherwise the buffered events can be retrieved
+    with :py:attr:`pmisc.TraceRecorder.events` or written to a file with
+    :py:meth:`pmisc.TraceRecorder.dump`
+
+    :param fname: File to stream events to. The file is overwritten when the
+                  recorder is started
+    :type  fname: string or None
+
+    :param maxsize: Maximum number of buffered events
+    :type  maxsize: positive integer
+
+    :param interval: Time between writes to the streaming file, in seconds
+    :type  interval: positive float
+
+    :raises RuntimeError: Argument \`fname\` is not valid
+    :raises RuntimeError: Argument \`interval\` is not valid
+    :raises RuntimeError: Argument \`maxsize\` is not valid
+
+    For example:
+
+        >>> import pmisc
+        >>> with pmisc.TraceRecorder() as rec:
+        ...     with pmisc.Timer(name="outer"):
+        ...         with pmisc.Timer(name="inner"):
+        ...             pass
+        >>> [(event["name"], event["ph"]) for event in rec.events][:4]
+        [('outer', 'B'), ('inner', 'B'), ('inner', 'E'), ('outer', 'E')]
+    """
+
+    def __init__(self, fname=None, maxsize=100000, interval=1.0):  # noqa
+        if (fname is not None) and ((not isinstance(fname, str)) or (not fname)):
+            raise RuntimeError("Argument `fname` is not valid")
+        if (
+            isinstance(maxsize, bool)
+            or (not isinstance(maxsize, int))
+            or (maxsize <= 0)
+        ):
+            raise RuntimeError("Argument `maxsize` is not valid")
+        if (
+            isinstance(interval, bool)
+            or (not isinstance(interval, (int, float)))
+            or (interval <= 0)
+        ):
+            raise RuntimeError("Argument `interval` is not valid")
+        self._fname = fname
+        self._interval = interval
+        self._buffer = collections.deque(maxlen=maxsize)
+        self._lock = threading.Lock()
+        self._dropped = 0
+        self._pid = os.getpid()
+        self._threads = {}
+        self._fobj = None
+        self._first = True
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def __enter__(self):  # noqa
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):  # noqa
+        self.stop()
+        return not exc_type is not None
+
+    def _add(self, phase, name, args=None, aid=None):
+        """Add an event to the ring buffer."""
+        tstamp = _CLOCK()
+        tid = _THREAD_ID()
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self._dropped += 1
+            self._buffer.append((phase, name, tstamp, tid, args, aid))
+            if tid not in self._threads:
+                self._threads[tid] = threading.current_thread().name
+
+    def _flush(self, last=False):
+        """Write buffered events to the streaming file."""
+        with self._lock:
+            items = list(self._buffer)
+            self._buffer.clear()
+        lines = [json.dumps(_event(self._pid, *item)) for item in items]
+        if last:
+            lines += [json.dumps(event) for event in self._metadata()]
+        if lines:
+            self._fobj.write(("[\n" if self._first else ",\n") + ",\n".join(lines))
+            self._first = False
+            self._fobj.flush()
+
+    def _metadata(self):
+        """Return thread name metadata events."""
+        return [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": self._pid,
+                "tid": tid,
+                "args": {"name": name},
+            }
+            for tid, name in sorted(self._threads.items())
+        ]
+
+    def _run(self):
+        """Stream events to the file until the recorder is stopped."""
+        while not self._stop_event.wait(self._interval):
+            self._flush()
+        self._flush()
+
+    def begin(self, name, **args):
+        """
+        Record a begin event in the current thread.
+
+        :param name: Event name
+        :type  name: string
+
+        :param args: Event arguments, must be JSON-serializable
+        """
+        self._add("B", name, args)
+
+    def dump(self, fname):
+        """
+        Write the buffered events to a file, in the JSON object format.
+
+        :param fname: File name
+        :type  fname: string
+        """
+        with open(fname, "w") as fobj:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ns"}, fobj)
+
+    def end(self, name, **args):
+        """
+        Record an end event in the current thread.
+
+        :param name: Event name
+        :type  name: string
+
+        :param args: Event arguments, must be JSON-serializable
+        """
+        self._add("E", name, args)
+
+    def start(self):
+        """
+        Make the recorder active, opening the streaming file if needed.
+
+        :raises RuntimeError: Another trace recorder is active
+        """
+        with _ACTIVE_LOCK:
+            if _RECORDER[0] is self:
+                return
+            if _RECORDER[0] is not None:
+                raise RuntimeError("Another trace recorder is active")
+            if self._fname is not None:
+                self._fobj = open(self._fname, "w")
+                self._first = True
+                self._stop_event.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name="pmisc-TraceRecorder"
+                )
+                self._thread.daemon = True
+                self._thread.start()
+            _RECORDER[0] = self
+
+    def stop(self):
+        """Make the recorder inactive, writing pending events and closing the file."""
+        with _ACTIVE_LOCK:
+            if _RECORDER[0] is not self:
+                return
+            _RECORDER[0] = None
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+            self._flush(last=True)
+            self._fobj.write("\n]\n" if not self._first else "[]\n")
+            self._fobj.close()
+            self._fobj = None
+
+    def _get_dropped(self):
+        return self._dropped
+
+    def _get_events(self):
+        with self._lock:
+            items = list(self._buffer)
+        return [_event(self._pid, *item) for item in items] + self._metadata()
+
+    dropped = property(_get_dropped, doc="Number of dropped events")
+    """
+    Returns the number of events dropped because the ring buffer was full
+
+    :rtype: integer
+    """
+
+    events = property(_get_events, doc="Buffered events")
+    """
+    Returns the events in the ring buffer, as Trace Event Format dictionaries,
+    followed by thread name metadata events
+
+    :rtype: list of dictionaries
+    """
@@ -0,0 +1,71 @@
+# benchmark.py
+# Copyright (c) 2013-2020 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111,W0212
+
+# Standard library imports
+import functools
+import gc
+import time
+
+# Intra-package imports
+import pmisc
+from pmisc.test import assert_arg_invalid as AI
+
+
+###
+# Test functions
+###
+def test_percentile():
+    """Test _percentile function behavior."""
+    obj = pmisc.benchmark._percentile
+    assert obj([1], 0.5) == 1
+    assert obj([1, 2, 3, 4], 0.5) == 2.5
+    assert obj([1, 2, 3, 4, 5], 0.25) == 2
+    assert obj([1, 2, 3, 4, 5], 1) == 5
+
+
+def test_bench_result():
+    """Test BenchResult class behavior."""
+    obj = pmisc.BenchResult([1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 100.0], 10, 1e-7)
+    assert obj.median == 5.0
+    assert obj.iqr == 4.0
+    assert obj.outliers == 1
+    assert obj.conf_int[0] <= obj.median <= obj.conf_int[1]
+    assert obj.ops == 0.2
+    assert obj.loops == 10
+    assert obj.overhead == 1e-7
+    assert obj.timings[-1] == 100.0
+    assert repr(obj).startswith("BenchResult(median=5, iqr=4, conf_int=(")
+
+
+def test_bench():  # noqa: D202
+    """Test bench function behavior."""
+
+    def func(value, scale=1):
+        calls.append(value * scale)
+
+    AI(pmisc.bench, "func", func=5)
+    for target in [True, "a", 0, -1.0]:
+        AI(functools.partial(pmisc.bench, func, target=target), "target")
+    for repeat in [True, 1.5, 0]:
+        AI(functools.partial(pmisc.bench, func, repeat=repeat), "repeat")
+    for warmup in [True, 1.5, -1]:
+        AI(functools.partial(pmisc.bench, func, warmup=warmup), "warmup")
+    AI(functools.partial(pmisc.bench, func, disable_gc=5), "disable_gc")
+    calls = []
+    result = pmisc.bench(func, 2, scale=3, target=0.005, repeat=5, warmup=2)
+    assert set(calls) == {6}
+    assert result.loops > 1
+    assert len(calls) >= (5 + 2) * result.loops
+    assert len(result.timings) == 5
+    assert result.median > 0
+    assert result.ops > 1000
+    # Slow functions are called once per repetition
+    result = pmisc.bench(time.sleep, 0.01, target=0.005, repeat=3)
+    assert result.loops == 1
+    assert 0.009 < result.median < 0.1
+    # Garbage collector is re-enabled
+    assert gc.isenabled()
+    pmisc.bench(func, 1, target=0.001, repeat=3, disable_gc=True)
+    assert gc.isenabled()
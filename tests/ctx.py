@@ -4,9 +4,19 @@
 # pylint: disable=C0111,E1129
 
 # Standard library imports
+import asyncio
+import functools
+import gc
 import os
 import platform
+import queue
 import re
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
 import time
 import uuid
 
@@ -18,9 +28,153 @@ import pmisc
 from pmisc.test import get_exmsg, compare_strings
 
 
+###
+# Helper functions
+###
+def _run(coro):
+    """Run coroutine in a new event loop, asyncio.run is only in Python 3.7+."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
 ###
 # Test functions
 ###
+def test_deadline():  # noqa: D202
+    """Test deadline context manager behavior."""
+
+    def callback(obj):
+        fired.append((obj, obj.snapshot))
+
+    for kwargs, arg in [
+        (dict(seconds=0), "seconds"),
+        (dict(seconds=True), "seconds"),
+        (dict(seconds=1, callback=5), "callback"),
+        (dict(seconds=1, snapshot=1), "snapshot"),
+        (dict(seconds=1, raise_exc=1), "raise_exc"),
+    ]:
+        with pytest.raises(RuntimeError) as excinfo:
+            pmisc.deadline(**kwargs)
+        assert get_exmsg(excinfo) == "Argument `{0}` is not valid".format(arg)
+    # Deadline met
+    fired = []
+    dobj = pmisc.deadline(0.05, callback=callback, snapshot=True)
+    assert (dobj.seconds, dobj.elapsed, dobj.overrun, dobj.snapshot) == (
+        0.05,
+        None,
+        None,
+        None,
+    )
+    with dobj:
+        pass
+    assert dobj.overrun is False
+    assert 0 <= dobj.elapsed < 0.05
+    time.sleep(0.1)
+    assert (fired, dobj.snapshot) == ([], None)
+    # Deadline overrun, callback is called while the block is running
+    with pmisc.deadline(0.01) as dobj:
+        time.sleep(0.02)
+    assert dobj.overrun and (dobj.elapsed >= 0.02) and (dobj.snapshot is None)
+    with pmisc.deadline(0.01, callback=callback, snapshot=True) as dobj:
+        time.sleep(0.2)
+        assert len(fired) == 1
+    assert dobj.overrun
+    assert fired[0][0] is dobj
+    assert "in test_deadline" in fired[0][1]
+    assert fired[0][1].rstrip().endswith("time.sleep(0.2)")
+    # Nested deadlines in several threads
+    fired = []
+    results = []
+
+    def worker(seconds):
+        with pmisc.deadline(seconds, callback=callback) as dobj:
+            time.sleep(0.05)
+        results.append(dobj)
+
+    threads = [threading.Thread(target=worker, args=(sec,)) for sec in [0.01, 1]]
+    with pmisc.deadline(0.02, callback=callback) as outer:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert sorted(dobj.seconds for dobj, _ in fired) == [0.01, 0.02]
+    assert sorted((dobj.seconds, dobj.overrun) for dobj in results) == [
+        (0.01, True),
+        (1, False),
+    ]
+    assert outer.overrun
+    # Raise mode
+    if hasattr(signal, "setitimer"):
+        with pytest.raises(TimeoutError) as excinfo:
+            with pmisc.deadline(0.01, raise_exc=True):
+                time.sleep(1)
+        assert get_exmsg(excinfo) == "Deadline of 0.01 seconds exceeded"
+        with pytest.raises(TimeoutError) as excinfo:
+            with pmisc.deadline(0.05, raise_exc=True) as outer:
+                with pmisc.deadline(1, raise_exc=True) as inner:
+                    time.sleep(0.01)
+                assert inner.overrun is False
+                time.sleep(1)
+        assert get_exmsg(excinfo) == "Deadline of 0.05 seconds exceeded"
+        assert outer.overrun and (outer.elapsed < 0.5)
+        assert signal.getitimer(signal.ITIMER_REAL) == (0.0, 0.0)
+        # Enclosing deadline due before the inner one
+        with pytest.raises(TimeoutError) as excinfo:
+            with pmisc.deadline(0.05, raise_exc=True) as outer:
+                with pmisc.deadline(2, raise_exc=True) as inner:
+                    time.sleep(1.5)
+        assert get_exmsg(excinfo) == "Deadline of 0.05 seconds exceeded"
+        assert (outer.elapsed < 0.5) and (inner.elapsed < 0.5)
+        assert signal.getitimer(signal.ITIMER_REAL) == (0.0, 0.0)
+        # Inner deadline due before the enclosing one
+        with pmisc.deadline(2, raise_exc=True) as outer:
+            with pytest.raises(TimeoutError) as excinfo:
+                with pmisc.deadline(0.05, raise_exc=True):
+                    time.sleep(1.5)
+            assert get_exmsg(excinfo) == "Deadline of 0.05 seconds exceeded"
+            assert 1 < signal.getitimer(signal.ITIMER_REAL)[0] <= 2
+        assert not outer.overrun
+        assert signal.getitimer(signal.ITIMER_REAL) == (0.0, 0.0)
+        assert signal.getsignal(signal.SIGALRM) == signal.SIG_DFL
+        errors = []
+
+        def raiser():
+            try:
+                with pmisc.deadline(0.1, raise_exc=True):
+                    pass
+            except RuntimeError as exc:
+                errors.append(str(exc))
+
+        thread = threading.Thread(target=raiser)
+        thread.start()
+        thread.join()
+        assert errors == ["Deadlines can only raise exceptions in the main thread"]
+
+
+@pytest.mark.skipif(
+    not hasattr(os, "register_at_fork"), reason="Fork hooks are not supported"
+)
+def test_deadline_fork():
+    """Test deadline watchdog in forked processes."""
+    cmd = (
+        "import os, sys, time, pmisc\n"
+        "def check():\n"
+        "    with pmisc.deadline(0.01, snapshot=True) as dobj:\n"
+        "        time.sleep(0.2)\n"
+        "    return dobj.snapshot is not None\n"
+        "assert check()\n"
+        "pid = os.fork()\n"
+        "if not pid:\n"
+        "    os._exit(int(not check()))\n"
+        "print(os.waitpid(pid, 0)[1])\n"
+    )
+    out = subprocess.check_output([sys.executable, "-c", cmd], timeout=30)
+    assert out.decode().strip() == "0"
+
+
 def test_ignored():
     """Test ignored context manager behavior."""
     with pmisc.TmpFile() as fname:
@@ -45,6 +199,62 @@ def test_ignored():
     assert excinfo.value.errno == 2
 
 
+def test_timed():  # noqa: D202
+    """Test timed decorator behavior."""
+
+    def func(num):
+        with pmisc.Timer(name="inner", registry=registry):
+            return 2 * num
+
+    async def afunc(num):
+        await asyncio.sleep(0)
+        return 3 * num
+
+    async def amain(obj):
+        return sum(await asyncio.gather(*[obj(num) for num in range(50)]))
+
+    for kwargs, arg in [
+        (dict(name=5), "name"),
+        (dict(name=""), "name"),
+        (dict(sample=0), "sample"),
+        (dict(sample=1.5), "sample"),
+        (dict(sample=True), "sample"),
+    ]:
+        with pytest.raises(RuntimeError) as excinfo:
+            pmisc.timed(**kwargs)
+        assert get_exmsg(excinfo) == "Argument `{0}` is not valid".format(arg)
+    # Every call measured
+    registry = pmisc.TimerRegistry()
+    obj = pmisc.timed(registry=registry)(func)
+    assert obj.__name__ == "func"
+    assert [obj(num) for num in range(10)] == [2 * num for num in range(10)]
+    stats = registry.stats()
+    name = func.__qualname__
+    assert sorted(stats) == [(name,), (name, "inner")]
+    assert stats[(name,)]["count"] == stats[(name, "inner")]["count"] == 10
+    assert stats[(name,)]["total"] >= stats[(name, "inner")]["total"]
+    # Sampled calls, statistics are extrapolated
+    registry.reset()
+    obj = pmisc.timed("sampled", sample=1 / 10.0, registry=registry)(func)
+    assert sum(obj(num) for num in range(10000)) == 2 * sum(range(10000))
+    node = registry.stats()[("sampled",)]
+    assert node["count"] % 10 == 0
+    assert 5000 <= node["count"] <= 15000
+    assert node["mean"] == node["total"] / node["count"]
+    # Exceptions are re-raised and measured
+    registry.reset()
+    obj = pmisc.timed("raiser", registry=registry)(lambda: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        obj()
+    assert registry.stats()[("raiser",)]["count"] == 1
+    # Coroutine functions
+    registry.reset()
+    for sample in [1, 0.5]:
+        obj = pmisc.timed("coro", sample=sample, registry=registry)(afunc)
+        assert _run(amain(obj)) == 3 * sum(range(50))
+    assert registry.stats()[("coro",)]["count"] >= 50
+
+
 def test_timer(capsys):
     """Test Timer context manager behavior."""
     # Test argument validation
@@ -66,6 +276,226 @@ def test_timer(capsys):
         time.sleep(0.5)
     out, _ = capsys.readouterr()
     assert tregexp.match(out.rstrip())
+    # Test clock selection
+    for clock in [5, "sundial"]:
+        with pytest.raises(RuntimeError) as excinfo:
+            pmisc.Timer(clock=clock)
+        assert get_exmsg(excinfo) == "Argument `clock` is not valid"
+    with pmisc.Timer(clock="process") as tobj:
+        time.sleep(0.1)
+    assert tobj.clock == "process"
+    assert tobj.elapsed_ns < 50e6
+    with pmisc.Timer() as tobj:
+        time.sleep(0.1)
+    assert tobj.clock == "wall"
+    assert isinstance(tobj.elapsed_ns, int) and (tobj.elapsed_ns >= 100e6)
+    assert tobj.elapsed_time == tobj.elapsed_ns / 1e6
+    # Test laps and splits
+    tobj = pmisc.Timer()
+    assert (tobj.elapsed_time, tobj.elapsed_ns, tobj.laps) == (None, 0, ())
+    for _ in range(3):
+        with tobj:
+            time.sleep(0.01)
+            split = tobj.split()
+            assert split > sum(tobj.laps)
+            with pytest.raises(RuntimeError) as excinfo:
+                tobj.reset()
+            assert get_exmsg(excinfo) == "Timer is running"
+        assert tobj.split() == tobj.elapsed_ns >= split
+    assert len(tobj.laps) == tobj.lap_count == 3
+    assert all(lap >= 10e6 for lap in tobj.laps)
+    assert sum(tobj.laps) == tobj.elapsed_ns
+    assert tobj.last_lap_ns == tobj.laps[-1]
+    assert tobj.elapsed_time == tobj.last_lap_ns / 1e6 < tobj.elapsed_ns / 1e6
+    tobj.reset()
+    assert (tobj.elapsed_time, tobj.elapsed_ns, tobj.laps) == (None, 0, ())
+    with pytest.raises(RuntimeError) as excinfo:
+        tobj.__exit__(None, None, None)
+    assert get_exmsg(excinfo) == "Timer is not running"
+    # Test timer shared by concurrent threads
+    barrier = threading.Barrier(2)
+
+    def worker():
+        with tobj:
+            barrier.wait()
+            time.sleep(0.01)
+            barrier.wait()
+
+    threads = [threading.Thread(target=worker) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert tobj.lap_count == 2
+    assert all(lap >= 10e6 for lap in tobj.laps)
+    tobj.reset()
+    assert (tobj.lap_count, tobj.last_lap_ns) == (0, None)
+    # Test bounded lap retention
+    for keep_laps in [-1, 1.0, True]:
+        with pytest.raises(RuntimeError) as excinfo:
+            pmisc.Timer(keep_laps=keep_laps)
+        assert get_exmsg(excinfo) == "Argument `keep_laps` is not valid"
+    for keep_laps in [0, 5]:
+        tobj = pmisc.Timer(keep_laps=keep_laps)
+        for _ in range(10):
+            with tobj:
+                pass
+        assert len(tobj.laps) == keep_laps
+        assert tobj.lap_count == 10
+        assert tobj.elapsed_ns >= sum(tobj.laps)
+        assert tobj.last_lap_ns >= 0
+        assert tobj.elapsed_time == tobj.last_lap_ns / 1e6
+    tobj = pmisc.Timer(keep_laps=5)
+    for num in range(10):
+        with tobj:
+            time.sleep(0.001 * num)
+    assert tobj.laps[-1] == tobj.last_lap_ns
+    assert min(tobj.laps) >= 5e6
+    # Test overhead calibration and subtraction
+    with pytest.raises(RuntimeError) as excinfo:
+        pmisc.Timer(subtract_overhead=1)
+    assert get_exmsg(excinfo) == "Argument `subtract_overhead` is not valid"
+    for clock in ["wall", "process"]:
+        tobj = pmisc.Timer(clock=clock)
+        assert isinstance(tobj.overhead_ns, int) and (tobj.overhead_ns >= 0)
+        assert isinstance(tobj.resolution_ns, int) and (tobj.resolution_ns > 0)
+        assert tobj.overhead_ns == pmisc.Timer(clock=clock).overhead_ns
+    tobj = pmisc.Timer()
+    sobj = pmisc.Timer(subtract_overhead=True)
+    for _ in range(101):
+        with tobj:
+            pass
+        with sobj:
+            pass
+    assert all(lap >= 0 for lap in sobj.laps)
+    assert sorted(sobj.laps)[50] < sorted(tobj.laps)[50]
+    with sobj:
+        time.sleep(0.01)
+    assert sobj.laps[-1] >= 10e6 - sobj.overhead_ns
+
+
+def test_timer_async():  # noqa: D202
+    """Test Timer asynchronous context manager behavior."""
+
+    async def sleeper(registry):
+        async with pmisc.Timer(name="sleeper", registry=registry) as tobj:
+            await asyncio.sleep(0.05)
+            async with pmisc.Timer(name="inner", registry=registry):
+                await asyncio.sleep(0.01)
+        return tobj
+
+    async def spinner(registry):
+        async with pmisc.Timer(name="spinner", registry=registry) as tobj:
+            tstart = time.perf_counter()
+            while time.perf_counter() - tstart < 0.05:
+                pass
+            await asyncio.sleep(0)
+            async with pmisc.Timer(name="inner", registry=registry):
+                await asyncio.sleep(0.01)
+        return tobj
+
+    async def main(registry):
+        return await asyncio.gather(sleeper(registry), spinner(registry))
+
+    async def raiser(tobj):
+        async with tobj:
+            raise RuntimeError("Error in code")
+
+    tobj = pmisc.Timer()
+    assert (tobj.cpu_ns, tobj.suspended_ns) == (None, None)
+    # Concurrent tasks
+    registry = pmisc.TimerRegistry()
+    _run(main(registry))
+    stats = registry.stats()
+    assert sorted(stats) == [
+        ("sleeper",),
+        ("sleeper", "inner"),
+        ("spinner",),
+        ("spinner", "inner"),
+    ]
+    assert all(node["count"] == 1 for node in stats.values())
+    # Suspended and CPU time
+    sobj = _run(sleeper(registry))
+    assert sobj.elapsed_ns >= 60e6
+    assert sobj.suspended_ns > sobj.cpu_ns
+    assert sobj.suspended_ns >= 50e6
+    bobj = _run(spinner(registry))
+    assert bobj.cpu_ns >= 20e6
+    assert bobj.cpu_ns + bobj.suspended_ns >= bobj.elapsed_ns
+    # Exceptions are re-raised
+    with pytest.raises(RuntimeError) as excinfo:
+        _run(raiser(tobj))
+    assert get_exmsg(excinfo) == "Error in code"
+    assert tobj.cpu_ns is not None
+    assert tobj.suspended_ns is not None
+    tobj.reset()
+    assert (tobj.cpu_ns, tobj.suspended_ns) == (None, None)
+    # Timer shared by concurrent tasks
+    registry = pmisc.TimerRegistry()
+    shared = pmisc.Timer(name="query", registry=registry)
+
+    async def query(delay):
+        async with shared:
+            await asyncio.sleep(delay)
+            assert shared.split() >= delay * 1e9
+            async with shared:
+                await asyncio.sleep(delay)
+
+    async def queries():
+        await asyncio.gather(query(0.02), query(0.01))
+
+    _run(queries())
+    assert shared.lap_count == 4
+    assert shared.elapsed_ns >= 60e6
+    assert shared.cpu_ns is not None
+    stats = registry.stats()
+    assert sorted(stats) == [("query",), ("query", "query")]
+    assert stats[("query",)]["count"] == 2
+    assert stats[("query", "query")]["count"] == 2
+    shared.reset()
+    assert shared.lap_count == 0
+
+
+def test_timer_gc():
+    """Test Timer garbage collection tracking."""
+    with pytest.raises(RuntimeError) as excinfo:
+        pmisc.Timer(track_gc=1)
+    assert get_exmsg(excinfo) == "Argument `track_gc` is not valid"
+    with pmisc.Timer() as tobj:
+        gc.collect()
+    assert (tobj.gc_collections, tobj.gc_generations, tobj.gc_pause_ns) == (
+        None,
+        None,
+        None,
+    )
+    ngens = len(gc.get_count())
+    callbacks = len(gc.callbacks)
+    outer = pmisc.Timer(track_gc=True)
+    assert (outer.gc_collections, outer.gc_pause_ns) == (0, 0)
+    assert outer.gc_generations == ngens * (0,)
+    with outer:
+        with pmisc.Timer(track_gc=True) as inner:
+            assert len(gc.callbacks) == callbacks + 1
+            gc.collect(0)
+            gc.collect()
+        assert len(gc.callbacks) == callbacks + 1
+    assert len(gc.callbacks) == callbacks
+    assert inner.gc_collections == outer.gc_collections >= 2
+    assert inner.gc_generations[0] >= 1
+    assert inner.gc_generations[-1] >= 1
+    assert 0 < inner.gc_pause_ns <= outer.gc_pause_ns <= outer.elapsed_ns
+    # Collections outside of the block are not reported
+    gc.collect()
+    with inner:
+        pass
+    assert inner.gc_generations[-1] == outer.gc_generations[-1]
+    inner.reset()
+    assert (inner.gc_collections, inner.gc_pause_ns) == (0, 0)
+    # Callback is removed on exceptions
+    with pytest.raises(RuntimeError):
+        with pmisc.Timer(track_gc=True):
+            raise RuntimeError("Error in code")
+    assert len(gc.callbacks) == callbacks
 
 
 def test_tmp_dir():
@@ -100,6 +530,186 @@ def test_tmp_dir():
     assert not os.path.exists(dname)
 
 
+def test_tmp_background(monkeypatch):  # noqa: D202
+    """Test TmpDir and TmpFile background removal."""
+
+    def write_data(fobj, num, suffix):
+        fobj.write(str(num) + suffix)
+
+    for obj in [pmisc.TmpDir, pmisc.TmpFile]:
+        with pytest.raises(RuntimeError) as excinfo:
+            obj(background=1)
+        assert get_exmsg(excinfo) == "Argument `background` is not valid"
+    with pmisc.TmpDir() as dpath:
+        with pmisc.TmpDir(dpath=dpath, background=True) as dname:
+            for num in range(20):
+                os.makedirs(os.path.join(dname, str(num), "sub"))
+                open(os.path.join(dname, str(num), "sub", "file"), "w").close()
+        assert not os.path.exists(dname)
+        with pmisc.TmpFile(background=True) as fname:
+            assert os.path.isfile(fname)
+        pmisc.ctx._drain_cleanup()
+        assert os.listdir(dpath) == []
+        assert not os.path.exists(fname)
+        # More removals than the queue holds
+        for _ in range(100):
+            with pmisc.TmpDir(dpath=dpath, background=True) as dname:
+                open(os.path.join(dname, "file"), "w").close()
+        pmisc.ctx._drain_cleanup()
+        assert os.listdir(dpath) == []
+        # Full queue, removal is done synchronously
+        full = queue.Queue(1)
+        full.put(os.path.join(dpath, "does_not_exist"))
+        monkeypatch.setattr(pmisc.ctx, "_CLEANUP_QUEUE", full)
+        with pmisc.TmpDir(dpath=dpath, background=True):
+            pass
+        assert os.listdir(dpath) == []
+        monkeypatch.undo()
+    # Keyword arguments are still passed to the write function
+    with pmisc.TmpFile(write_data, 5, background=True, suffix="x") as fname:
+        with open(fname) as fobj:
+            assert fobj.read() == "5x"
+
+
+@pytest.mark.skipif(
+    not hasattr(os, "register_at_fork"), reason="Fork hooks are not supported"
+)
+def test_tmp_background_fork():
+    """Test TmpDir background removal in forked processes."""
+    # The child must not wait on the cleanup thread of its parent at exit
+    cmd = (
+        "import os, sys, pmisc\n"
+        "with pmisc.TmpDir(background=True):\n"
+        "    pass\n"
+        "pid = os.fork()\n"
+        "if not pid:\n"
+        "    with pmisc.TmpDir(background=True) as dname:\n"
+        "        pass\n"
+        "    pmisc.ctx._drain_cleanup()\n"
+        "    sys.exit(int(os.path.exists(dname)))\n"
+        "print(os.waitpid(pid, 0)[1])\n"
+    )
+    out = subprocess.check_output([sys.executable, "-c", cmd], timeout=30)
+    assert out.decode().strip() == "0"
+
+
+def test_tmp_backend(monkeypatch):  # noqa: D202
+    """Test TmpDir and TmpFile storage backends."""
+
+    def write_data(fobj):
+        fobj.write("Hello world!")
+
+    for obj, backend in [
+        (pmisc.TmpDir, 5),
+        (pmisc.TmpDir, "memfd"),
+        (pmisc.TmpFile, "ram"),
+    ]:
+        with pytest.raises(RuntimeError) as excinfo:
+            obj(backend=backend)
+        assert get_exmsg(excinfo) == "Argument `backend` is not valid"
+    shm = pmisc.ctx._shm_dir()
+    with pmisc.TmpDir(backend="auto") as dname:
+        assert os.path.isdir(dname)
+        if shm:
+            assert os.path.dirname(dname) == shm
+    with pmisc.TmpFile(write_data, backend="auto") as fname:
+        if shm:
+            assert os.path.dirname(fname) == shm
+        with open(fname) as fobj:
+            assert fobj.read() == "Hello world!"
+    assert not os.path.exists(fname)
+    # Fall back to default directory if there is not enough space
+    monkeypatch.setattr(pmisc.ctx, "_SHM_MIN_FREE", 2 ** 62)
+    assert pmisc.ctx._shm_dir() is None
+    with pmisc.TmpDir(backend="auto") as dname:
+        assert os.path.dirname(dname) == tempfile.gettempdir()
+    monkeypatch.setattr(pmisc.ctx, "_SHM_DIR", "/does/not/exist")
+    monkeypatch.setattr(pmisc.ctx, "_SHM_MIN_FREE", 0)
+    assert pmisc.ctx._shm_dir() is None
+    monkeypatch.undo()
+    # Anonymous memory file
+    if hasattr(os, "memfd_create") and os.path.isdir("/proc/self/fd"):
+        with pmisc.TmpFile(write_data, backend="memfd", background=True) as fname:
+            assert fname.startswith("/proc/self/fd/")
+            with open(fname) as fobj:
+                assert fobj.read() == "Hello world!"
+            with open(fname, "a") as fobj:
+                fobj.write(" Bye")
+            with open(fname) as fobj:
+                assert fobj.read() == "Hello world! Bye"
+            fdesc = int(os.path.basename(fname))
+        with pytest.raises(OSError):
+            os.fstat(fdesc)
+
+
+def test_tmp_dir_pool():
+    """Test TmpDirPool class behavior."""
+    for kwargs, arg in [
+        (dict(size=0), "size"),
+        (dict(size=True), "size"),
+        (dict(dpath=5), "dpath"),
+        (dict(dpath="not_a_directory"), "dpath"),
+    ]:
+        with pytest.raises(RuntimeError) as excinfo:
+            pmisc.TmpDirPool(**kwargs)
+        assert get_exmsg(excinfo) == "Argument `{0}` is not valid".format(arg)
+    with pmisc.TmpDir() as dpath:
+        with pmisc.TmpDirPool(size=2, dpath=dpath) as pool:
+            assert len(os.listdir(dpath)) == 2
+            # Directories are reused and emptied
+            with pool.tmpdir() as dname:
+                assert os.path.dirname(dname) == dpath
+                assert os.listdir(dname) == []
+                os.makedirs(os.path.join(dname, "sub", "dir"))
+                open(os.path.join(dname, "sub", "file"), "w").close()
+                open(os.path.join(dname, "file"), "w").close()
+                os.symlink(dpath, os.path.join(dname, "link"))
+            assert len(os.listdir(dpath)) == 2
+            dnames = [pool.acquire() for _ in range(3)]
+            assert dname in dnames
+            assert all(os.listdir(item) == [] for item in dnames)
+            assert len(set(dnames)) == 3
+            assert len(os.listdir(dpath)) == 3
+            # Pool is bounded
+            for item in dnames:
+                pool.release(item)
+            assert len(os.listdir(dpath)) == 2
+            assert not os.path.exists(dnames[-1])
+            with pytest.raises(RuntimeError) as excinfo:
+                pool.release(dnames[0])
+            assert get_exmsg(excinfo) == "Argument `dname` is not valid"
+            # Exceptions are re-raised and directories released
+            with pytest.raises(RuntimeError):
+                with pool.tmpdir() as dname:
+                    raise RuntimeError("Error in code")
+            assert os.path.isdir(dname)
+            # Thread safety
+            errors = []
+
+            def worker():
+                try:
+                    for num in range(50):
+                        with pool.tmpdir() as item:
+                            fname = os.path.join(item, "file{0}".format(num))
+                            open(fname, "w").close()
+                            assert os.listdir(item) == [os.path.basename(fname)]
+                except Exception as exc:  # pylint: disable=W0703
+                    errors.append(exc)
+
+            threads = [threading.Thread(target=worker) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert errors == []
+            assert len(os.listdir(dpath)) == 2
+        assert os.listdir(dpath) == []
+        pool = pmisc.TmpDirPool(size=1, dpath=dpath)
+        assert len(os.listdir(dpath)) == 1
+        del pool
+        assert os.listdir(dpath) == []
+
+
 def test_tmp_file():  # noqa: D202
     """Test TmpFile context manager behavior."""
 
@@ -139,3 +749,304 @@ def test_tmp_file():  # noqa: D202
         assert line == ["(3,){'data': 'foo'}"]
         assert os.path.exists(fname)
     assert not os.path.exists(fname)
+    # Test any callable as writer
+    class Writer(object):
+        def __init__(self, text):
+            self.text = text
+
+        def write(self, fobj):
+            fobj.write(self.text)
+
+    with pmisc.TmpFile(functools.partial(write_data_with_args, data="bar")) as fname:
+        with open(fname, "r") as fobj:
+            assert fobj.read() == "(){'data': 'bar'}"
+    with pmisc.TmpFile(Writer("Hello").write) as fname:
+        with open(fname, "r") as fobj:
+            assert fobj.read() == "Hello"
+    # Test contents, written before the function pointed to is called
+    for contents in ["Hello world!", iter(["Hello", " ", "world!"])]:
+        with pmisc.TmpFile(contents=contents) as fname:
+            with open(fname, "r") as fobj:
+                assert fobj.read() == "Hello world!"
+        assert not os.path.exists(fname)
+    with pmisc.TmpFile(Writer(" Bye").write, contents="Hello") as fname:
+        with open(fname, "r") as fobj:
+            assert fobj.read() == "Hello Bye"
+    data = bytes(range(256))
+    for contents, buffering in [
+        (data, -1),
+        (bytearray(data), 0),
+        (memoryview(data), 1024),
+        ((data[num : num + 16] for num in range(0, 256, 16)), 0),
+    ]:
+        with pmisc.TmpFile(
+            contents=contents, binary=True, buffering=buffering
+        ) as fname:
+            with open(fname, "rb") as fobj:
+                assert fobj.read() == data
+    # Test the file is removed if writing fails
+    def write_error(fobj):
+        raise ValueError("Writing failed")
+
+    names = set(os.listdir(tempfile.gettempdir()))
+    with pytest.raises(ValueError) as excinfo:
+        with pmisc.TmpFile(write_error, contents="Hello"):
+            pass
+    assert get_exmsg(excinfo) == "Writing failed"
+    assert set(os.listdir(tempfile.gettempdir())) <= names
+    # Test argument validation of new arguments
+    for kwargs, arg in [
+        ({"binary": 1}, "binary"),
+        ({"buffering": 0}, "buffering"),
+        ({"buffering": -2, "binary": True}, "buffering"),
+        ({"buffering": 1.5}, "buffering"),
+        ({"buffering": True}, "buffering"),
+        ({"contents": 5}, "contents"),
+        ({"contents": b"Hello"}, "contents"),
+        ({"contents": "Hello", "binary": True}, "contents"),
+    ]:
+        with pytest.raises(RuntimeError) as excinfo:
+            pmisc.TmpFile(**kwargs)
+        assert get_exmsg(excinfo) == "Argument `{0}` is not valid".format(arg)
+    if hasattr(os, "memfd_create") and os.path.isdir("/proc/self/fd"):
+        with pmisc.TmpFile(contents=data, binary=True, backend="memfd") as fname:
+            with open(fname, "rb") as fobj:
+                assert fobj.read() == data
+
+
+def test_tmp_file_mapped():
+    """Test TmpFile preallocation and memory-mapped mode."""
+    for kwargs, arg in [
+        ({"size": 0}, "size"),
+        ({"size": 1.0}, "size"),
+        ({"size": True}, "size"),
+        ({"mapped": 1}, "mapped"),
+    ]:
+        with pytest.raises(RuntimeError) as excinfo:
+            pmisc.TmpFile(**kwargs)
+        assert get_exmsg(excinfo) == "Argument `{0}` is not valid".format(arg)
+    with pmisc.TmpFile(size=4096) as fname:
+        assert os.path.getsize(fname) == 4096
+    # Fill file in place, read it back by name
+    with pmisc.TmpFile(size=1024, mapped=True) as (fname, fmap):
+        assert len(fmap) == 1024
+        fmap[:5] = b"Hello"
+        with open(fname, "rb") as fobj:
+            assert fobj.read(6) == b"Hello\0"
+        view = memoryview(fmap)
+        assert view[:5].tobytes() == b"Hello"
+        view.release()
+    assert fmap.closed
+    assert not os.path.exists(fname)
+    # Buffers exported by the mapping have to be released before exit
+    with pytest.raises(BufferError):
+        with pmisc.TmpFile(size=16, mapped=True) as (fname, fmap):
+            view = memoryview(fmap)
+    assert not os.path.exists(fname)
+    view.release()
+    with pytest.raises(RuntimeError) as excinfo:
+        with pmisc.TmpFile(size=16, mapped=True) as (fname, fmap):
+            view = memoryview(fmap)
+            raise RuntimeError("Error in code")
+    assert get_exmsg(excinfo) == "Error in code"
+    assert not os.path.exists(fname)
+    view.release()
+    # Map written contents, the file is not shrunk to the contents size
+    with pmisc.TmpFile(contents=b"Hello", binary=True, mapped=True) as (_, fmap):
+        assert fmap[:] == b"Hello"
+    with pmisc.TmpFile(contents="Hello", size=8, mapped=True) as (_, fmap):
+        assert fmap[:] == b"Hello\0\0\0"
+    # Empty files cannot be mapped
+    names = set(os.listdir(tempfile.gettempdir()))
+    with pytest.raises(ValueError):
+        with pmisc.TmpFile(mapped=True):
+            pass
+    assert set(os.listdir(tempfile.gettempdir())) <= names
+    if hasattr(os, "memfd_create") and os.path.isdir("/proc/self/fd"):
+        with pmisc.TmpFile(size=64, mapped=True, backend="memfd") as (fname, fmap):
+            fmap[-3:] = b"Bye"
+            with open(fname, "rb") as fobj:
+                assert fobj.read()[-3:] == b"Bye"
+
+    # Keywords reserved by the context manager are not passed to the writer,
+    # functools.partial passes them
+    def write_size(fobj, size=None):
+        fobj.write(str(size))
+
+    with pmisc.TmpFile(write_size, size=10) as fname:
+        with open(fname, "rb") as fobj:
+            assert fobj.read() == b"None" + b"\0" * 6
+    with pmisc.TmpFile(functools.partial(write_size, size=10)) as fname:
+        with open(fname) as fobj:
+            assert fobj.read() == "10"
+
+
+def test_tmp_files():  # noqa: D202
+    """Test TmpFiles context manager behavior."""
+
+    def write_data(fobj, text="Hello"):
+        fobj.write(text)
+
+    for kwargs, arg in [
+        ({"specs": -1}, "specs"),
+        ({"specs": True}, "specs"),
+        ({"specs": "abc"}, "specs"),
+        ({"specs": 5.0}, "specs"),
+        ({"specs": [5]}, "specs"),
+        ({"specs": [b"Hello"]}, "specs"),
+        ({"specs": ["Hello"], "binary": True}, "specs"),
+        ({"specs": 1, "binary": 1}, "binary"),
+        ({"specs": 1, "workers": 0}, "workers"),
+        ({"specs": 1, "workers": 1.0}, "workers"),
+        ({"specs": 1, "suffix": 5}, "suffix"),
+        ({"specs": 1, "suffix": "a/b"}, "suffix"),
+        ({"specs": 1, "dpath": "/does/not/exist"}, "dpath"),
+        ({"specs": 1, "background": 1}, "background"),
+        ({"specs": 1, "backend": "memfd"}, "backend"),
+    ]:
+        with pytest.raises(RuntimeError) as excinfo:
+            pmisc.TmpFiles(**kwargs)
+        assert get_exmsg(excinfo) == "Argument `{0}` is not valid".format(arg)
+    # Empty files
+    with pmisc.TmpFiles(12, suffix=".txt") as fnames:
+        assert len(fnames) == 12
+        assert len(set(os.path.dirname(fname) for fname in fnames)) == 1
+        dname = os.path.dirname(fnames[0])
+        assert sorted(os.listdir(dname)) == [os.path.basename(item) for item in fnames]
+        assert os.path.basename(fnames[0]) == "00.txt"
+        assert all(os.path.getsize(fname) == 0 for fname in fnames)
+    assert not os.path.exists(dname)
+    with pmisc.TmpFiles([]) as fnames:
+        assert fnames == []
+    # Contents and writers, serially and in a thread pool
+    for workers in [1, 4]:
+        specs = [
+            "Hello",
+            None,
+            write_data,
+            functools.partial(write_data, text="Bye"),
+            iter(["a", "b"]),
+        ]
+        with pmisc.TmpFiles(specs, workers=workers) as fnames:
+            data = []
+            for fname in fnames:
+                with open(fname) as fobj:
+                    data.append(fobj.read())
+            assert data == ["Hello", "", "Hello", "Bye", "ab"]
+    data = [bytes([num]) * 1000 for num in range(64)]
+    with pmisc.TmpFiles(data, workers=8, binary=True, background=True) as fnames:
+        for fname, item in zip(fnames, data):
+            with open(fname, "rb") as fobj:
+                assert fobj.read() == item
+    pmisc.ctx._drain_cleanup()
+    assert not os.path.exists(os.path.dirname(fnames[0]))
+    # Directory is removed if writing fails
+    def write_error(fobj):
+        raise ValueError("Writing failed")
+
+    for workers in [1, 2]:
+        obj = pmisc.TmpFiles([None, write_error, None], workers=workers)
+        with pytest.raises(ValueError) as excinfo:
+            with obj:
+                pass
+        assert get_exmsg(excinfo) == "Writing failed"
+        assert not os.path.exists(os.path.dirname(obj._fnames[0]))
+    # Exceptions within the with statement are re-raised
+    with pytest.raises(OSError):
+        with pmisc.TmpFiles(2) as fnames:
+            raise OSError("No data")
+    assert not os.path.exists(os.path.dirname(fnames[0]))
+
+
+def test_tmp_dir_template(monkeypatch):  # noqa: D202
+    """Test TmpDir population from a template directory."""
+
+    def raise_oserror(*args, **kwargs):
+        raise OSError("Not supported")
+
+    for kwargs, arg in [
+        ({"template": 5}, "template"),
+        ({"template": "/does/not/exist"}, "template"),
+        ({"strategy": "symlink"}, "strategy"),
+        ({"strategy": 5}, "strategy"),
+    ]:
+        with pytest.raises(RuntimeError) as excinfo:
+            pmisc.TmpDir(**kwargs)
+        assert get_exmsg(excinfo) == "Argument `{0}` is not valid".format(arg)
+    obj = pmisc.TmpDir()
+    assert obj.strategy is None
+    with pmisc.TmpDir() as template:
+        os.makedirs(os.path.join(template, "sub", "empty"))
+        for num, name in enumerate(["a.txt", os.path.join("sub", "b.bin")]):
+            with open(os.path.join(template, name), "wb") as fobj:
+                fobj.write(bytes([num]) * 100000)
+        os.chmod(os.path.join(template, "a.txt"), 0o640)
+        os.symlink("a.txt", os.path.join(template, "link"))
+        names = ["a.txt", "link", os.path.join("sub", "b.bin")]
+
+        def check(dname, linked):
+            tree = sorted(
+                os.path.relpath(os.path.join(dpath, item), dname)
+                for dpath, dnames, fnames in os.walk(dname)
+                for item in dnames + fnames
+            )
+            assert tree == sorted(names + ["sub", os.path.join("sub", "empty")])
+            assert os.readlink(os.path.join(dname, "link")) == "a.txt"
+            for name in ["a.txt", os.path.join("sub", "b.bin")]:
+                with open(os.path.join(dname, name), "rb") as fobj:
+                    with open(os.path.join(template, name), "rb") as fref:
+                        assert fobj.read() == fref.read()
+                path, ref = os.path.join(dname, name), os.path.join(template, name)
+                assert os.path.samefile(path, ref) == linked
+            assert os.stat(os.path.join(dname, "a.txt")).st_mode & 0o777 == 0o640
+
+        with pmisc.TmpDir(template=template, strategy="hardlink") as dname:
+            assert obj.strategy is None
+            check(dname, True)
+        for strategy in ["reflink", "copy"]:
+            obj = pmisc.TmpDir(template=template, strategy=strategy)
+            with obj as dname:
+                assert obj.strategy in [strategy, "copy"]
+                check(dname, False)
+                with open(os.path.join(dname, "a.txt"), "ab") as fobj:
+                    fobj.write(b"More data")
+                assert os.path.getsize(os.path.join(template, "a.txt")) == 100000
+            assert not os.path.exists(dname)
+        # Files are populated in parallel if there are several CPUs
+        monkeypatch.setattr(os, "cpu_count", lambda: 4)
+        with pmisc.TmpDir(template=template, strategy="copy") as dname:
+            check(dname, False)
+        # Fall back to other strategies
+        monkeypatch.setattr(os, "link", raise_oserror)
+        monkeypatch.setattr(pmisc.ctx, "fcntl", None)
+        obj = pmisc.TmpDir(template=template, strategy="hardlink")
+        with obj as dname:
+            assert obj.strategy == "copy"
+            check(dname, False)
+        monkeypatch.setattr(os, "copy_file_range", raise_oserror, raising=False)
+        with pmisc.TmpDir(template=template, strategy="copy") as dname:
+            check(dname, False)
+        monkeypatch.delattr(os, "copy_file_range", raising=False)
+        with pmisc.TmpDir(template=template, strategy="copy") as dname:
+            check(dname, False)
+        monkeypatch.undo()
+        # Directory is removed if population fails
+        monkeypatch.setattr(shutil, "copymode", raise_oserror)
+        obj = pmisc.TmpDir(template=template, strategy="copy")
+        with pytest.raises(OSError):
+            with obj:
+                pass
+        assert not os.path.exists(obj._dname)
+        monkeypatch.undo()
+        with pmisc.TmpDir(template=os.path.join(template, "sub", "empty")) as dname:
+            assert os.listdir(dname) == []
+        # Special files are rejected
+        if hasattr(os, "mkfifo"):
+            fifo = os.path.join(template, "sub", "empty", "fifo")
+            os.mkfifo(fifo)
+            obj = pmisc.TmpDir(template=template)
+            with pytest.raises(shutil.SpecialFileError) as excinfo:
+                with obj:
+                    pass
+            assert get_exmsg(excinfo) == "`{0}` is not a regular file".format(fifo)
+            assert not os.path.exists(obj._dname)
@@ -0,0 +1,158 @@
+# export.py
+# Copyright (c) 2013-2020 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111,W0212
+
+# Standard library imports
+import json
+import os
+import socket
+
+# Intra-package imports
+import pmisc
+from pmisc.test import assert_arg_invalid as AI
+from pmisc.test import assert_exception as AE
+
+
+###
+# Helper classes
+###
+class _ListExporter(pmisc.Exporter):
+    def __init__(self, *args, **kwargs):
+        super(_ListExporter, self).__init__(*args, **kwargs)
+        self.writes = []
+
+    def _write(self, aggregates):
+        self.writes.append(aggregates)
+
+
+###
+# Test functions
+###
+def test_exporter():
+    """Test Exporter class behavior."""
+    # Sub-classes must implement the _write method
+    class Incomplete(pmisc.Exporter):
+        pass
+
+    AE(pmisc.Exporter, TypeError, r"Can.t instantiate abstract class .*_write.*")
+    AE(Incomplete, TypeError, r"Can.t instantiate abstract class .*_write.*")
+    AI(_ListExporter, "interval", interval=0)
+    AI(_ListExporter, "interval", interval=True)
+    AI(_ListExporter, "maxsize", maxsize=1.5)
+    AI(_ListExporter, "maxsize", maxsize=0)
+    # Queue is bounded and drops are counted
+    obj = _ListExporter(maxsize=2)
+    for num in range(5):
+        obj.submit("name", num)
+    assert obj.dropped == 3
+    aggregates = {}
+    obj._drain(aggregates, 0)
+    assert aggregates == {"name": [2, 1, 0, 1]}
+    obj._drain(aggregates, 0.01)
+    assert aggregates == {"name": [2, 1, 0, 1]}
+    obj.submit(("a", "b"), 10)
+    obj._drain(aggregates, 0)
+    assert aggregates == {"name": [2, 1, 0, 1], "a/b": [1, 10, 10, 10]}
+    obj.submit(("a", "b"), 20, 3)
+    obj._drain(aggregates, 0)
+    assert aggregates["a/b"] == [4, 70, 10, 20]
+    # Pending measurements are written when the exporter is stopped
+    with _ListExporter(interval=60) as obj:
+        obj.submit("name", 5)
+    assert obj.writes == [{"name": [1, 5, 5, 5]}]
+
+
+def test_json_lines_exporter():
+    """Test JsonLinesExporter class behavior."""
+    AI(pmisc.JsonLinesExporter, "fname", fname=5)
+    AI(pmisc.JsonLinesExporter, "fname", fname="")
+    registry = pmisc.TimerRegistry()
+    with pmisc.TmpDir() as dname:
+        fname = os.path.join(dname, "metrics.jsonl")
+        with pmisc.JsonLinesExporter(fname, interval=60) as obj:
+            registry.add_exporter(obj)
+            registry.add_exporter(obj)
+            for _ in range(3):
+                with pmisc.Timer(name="outer", registry=registry):
+                    with pmisc.Timer(name="inner", registry=registry):
+                        pass
+            registry.remove_exporter(obj)
+            with pmisc.Timer(name="outer", registry=registry):
+                pass
+        with open(fname) as fobj:
+            lines = [json.loads(line) for line in fobj]
+    assert [(line["name"], line["count"]) for line in lines] == [
+        ("outer", 3),
+        ("outer/inner", 3),
+    ]
+    assert lines[0]["min"] <= lines[0]["sum"] / 3.0 <= lines[0]["max"]
+    assert lines[0]["dropped"] == 0
+    assert lines[0]["time"] > 0
+
+
+def test_prometheus_exporter():
+    """Test PrometheusExporter class behavior."""
+    AI(pmisc.PrometheusExporter, "fname", fname=None)
+    AI(pmisc.PrometheusExporter, "metric", fname="a", metric="1metric")
+    AI(pmisc.PrometheusExporter, "metric", fname="a", metric=5)
+    with pmisc.TmpDir() as dname:
+        fname = os.path.join(dname, "metrics.prom")
+        obj = pmisc.PrometheusExporter(fname, metric="app_seconds", maxsize=3)
+        for _ in range(2):
+            obj.submit(("request", "db"), 1500000000)
+        obj.submit('a"b', 1000)
+        obj.submit("drop", 1)
+        obj.start()
+        obj.start()
+        obj.stop()
+        obj.stop()
+        obj.submit(("request", "db"), 500000000)
+        with obj:
+            pass
+        with open(fname) as fobj:
+            lines = fobj.read().splitlines()
+        assert sorted(os.listdir(dname)) == ["metrics.prom"]
+    assert lines == [
+        "# HELP app_seconds Duration of pmisc.Timer blocks",
+        "# TYPE app_seconds summary",
+        'app_seconds_count{name="a\\"b"} 1',
+        'app_seconds_sum{name="a\\"b"} 1e-06',
+        'app_seconds_count{name="request/db"} 3',
+        'app_seconds_sum{name="request/db"} 3.5',
+        "# HELP app_seconds_dropped_total Measurements dropped",
+        "# TYPE app_seconds_dropped_total counter",
+        "app_seconds_dropped_total 1",
+    ]
+
+
+def test_statsd_exporter():
+    """Test StatsdExporter class behavior."""
+    AI(pmisc.StatsdExporter, "host", host="")
+    AI(pmisc.StatsdExporter, "port", port=0)
+    AI(pmisc.StatsdExporter, "port", port=70000)
+    AI(pmisc.StatsdExporter, "prefix", prefix=None)
+    AI(pmisc.StatsdExporter, "packet_size", packet_size=0)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.settimeout(5)
+    port = sock.getsockname()[1]
+    try:
+        obj = pmisc.StatsdExporter(
+            port=port, prefix="app.", maxsize=4, packet_size=40, interval=0.05
+        )
+        obj.submit(("request", "db:query"), 2000000)
+        obj.submit(("request", "db:query"), 4000000)
+        obj.submit("single", 1000000)
+        obj.submit("other", 1000000)
+        obj.submit("drop", 1)
+        with obj:
+            packets = [sock.recv(1024) for _ in range(3)]
+    finally:
+        sock.close()
+    assert packets == [
+        b"app.other:1.000000|ms",
+        b"app.request.db_query:3.000000|ms|@0.5",
+        b"app.single:1.000000|ms\napp.dropped:1|c",
+    ]
+    assert obj._sock is None
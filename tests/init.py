@@ -0,0 +1,65 @@
+# init.py
+# Copyright (c) 2013-2020 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111
+
+# Standard library imports
+import importlib
+import inspect
+import subprocess
+import sys
+
+# PyPI imports
+import pytest
+
+# Intra-package imports
+import pmisc
+
+
+###
+# Test functions
+###
+def test_lazy_api():
+    """Test that the lazy-loading table covers the sub-modules public API."""
+    for mname, names in pmisc._API.items():
+        mobj = importlib.import_module("pmisc." + mname)
+        public = [
+            name
+            for name, obj in vars(mobj).items()
+            if (not name.startswith("_"))
+            and (inspect.isfunction(obj) or inspect.isclass(obj))
+            and (obj.__module__ == mobj.__name__)
+        ]
+        assert sorted(public) == sorted(
+            name for name in names if name not in ("LDELIM", "RDELIM")
+        )
+        for name in names:
+            assert getattr(pmisc, name) is getattr(mobj, name)
+    assert set(pmisc.__all__) <= set(dir(pmisc))
+    assert pmisc.test is sys.modules["pmisc.test"]
+    with pytest.raises(AttributeError) as excinfo:
+        pmisc.not_an_attribute  # pylint: disable=W0104
+    assert str(excinfo.value) == "module 'pmisc' has no attribute 'not_an_attribute'"
+
+
+@pytest.mark.skipif(
+    sys.hexversion < 0x03070000, reason="Sub-modules are imported eagerly"
+)
+def test_lazy_import():
+    """Test that sub-modules are only imported when used."""
+    cmd = (
+        "import sys, pmisc; "
+        "print(sorted(m for m in sys.modules if m.startswith('pmisc'))); "
+        "pmisc.CiDict; "
+        "print('pmisc.test' in sys.modules, 'pytest' in sys.modules); "
+        "pmisc.compare_strings; "
+        "print('pmisc.test' in sys.modules, 'pytest' in sys.modules); "
+        "print(sys.excepthook is pmisc._excepthook)"
+    )
+    out = subprocess.check_output([sys.executable, "-c", cmd]).decode()
+    assert out.split("\n")[:4] == [
+        "['pmisc', 'pmisc.pkgdata']",
+        "False False",
+        "True True",
+        "True",
+    ]
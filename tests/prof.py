@@ -0,0 +1,297 @@
+# prof.py
+# Copyright (c) 2013-2020 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111,W0612
+
+# Standard library imports
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+# PyPI imports
+import pytest
+
+# Intra-package imports
+import pmisc
+from pmisc.test import assert_exception as AE
+from pmisc.test import get_exmsg
+
+
+###
+# Helper functions
+###
+def _leaf():
+    return sum(range(1000))
+
+
+def _spin(pobj, samples):
+    while pobj.samples < samples:
+        _leaf()
+
+
+###
+# Test functions
+###
+def test_memtrace():
+    """Test MemTrace context manager behavior."""
+    assert not tracemalloc.is_tracing()
+    obj = pmisc.MemTrace()
+    assert (obj.net, obj.peak, obj.rss, obj.top) == (None, None, None, None)
+    with obj:
+        assert tracemalloc.is_tracing()
+        data = bytearray(1000000)
+        del data
+        keep = bytearray(200000)
+    assert not tracemalloc.is_tracing()
+    assert 190000 <= obj.net < 900000
+    assert obj.peak >= 900000
+    assert obj.top is None
+    assert (obj.rss is None) or isinstance(obj.rss, int)
+    # Nesting, peak of outer block includes peak of inner block
+    with pmisc.MemTrace() as outer:
+        keep = bytearray(100000)
+        with pmisc.MemTrace() as inner:
+            data = bytearray(2000000)
+            del data
+        assert tracemalloc.is_tracing()
+    assert not tracemalloc.is_tracing()
+    assert inner.peak >= 1900000
+    assert outer.peak >= inner.peak
+    assert 90000 <= outer.net < 1900000
+    # Top allocation sites
+    with pmisc.MemTrace(top=2) as obj:
+        keep = [bytearray(100) for _ in range(5000)]
+    assert len(obj.top) == 2
+    location, size, count = obj.top[0]
+    assert location.startswith(__file__.rstrip("c"))
+    assert size >= 450000
+    assert count >= 5000
+    # Exceptions are not trapped
+    with pytest.raises(ValueError):
+        with pmisc.MemTrace():
+            raise ValueError("Error")
+    assert not tracemalloc.is_tracing()
+
+
+def test_memtrace_tracing():
+    """Test MemTrace when tracemalloc is already tracing."""
+    tracemalloc.start()
+    try:
+        with pmisc.MemTrace() as obj:
+            data = bytearray(1000000)
+        assert tracemalloc.is_tracing()
+        assert obj.net >= 900000
+        assert obj.peak >= obj.net
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize(
+    "args, arg",
+    [
+        (dict(top=-1), "top"),
+        (dict(top=1.5), "top"),
+        (dict(top=True), "top"),
+        (dict(nframes=0), "nframes"),
+        (dict(nframes="a"), "nframes"),
+    ],
+)
+def test_memtrace_exceptions(args, arg):
+    """Test MemTrace exceptions."""
+    exmsg = "Argument `{0}` is not valid".format(arg)
+    AE(pmisc.MemTrace, RuntimeError, exmsg, **args)
+
+
+def test_profile(capsys):
+    """Test Profile context manager behavior."""
+    # Load module before profiling, lazy import would dominate the profile
+    pmisc.isnumber(5)
+    pobj = pmisc.Profile()
+    assert (pobj.report(), pobj.stats) == ("", None)
+    with pobj:
+        for _ in range(3):
+            _leaf()
+        pmisc.isnumber(5)
+    assert isinstance(pobj.stats, pstats.Stats)
+    lines = pobj.report().splitlines()
+    assert lines[0].split() == ["Function", "calls", "total", "cumulative"]
+    labels = [line.rsplit(None, 3)[0] for line in lines[1:]]
+    code = _leaf.__code__
+    assert "_leaf ({0}:{1})".format(code.co_filename, code.co_firstlineno) in labels
+    assert "<built-in method builtins.sum>" in labels
+    row = [line for line in lines if line.startswith("_leaf (")][0].split()
+    assert row[-3] == "3"
+    cumulative = [float(line.split()[-1]) for line in lines[1:]]
+    assert cumulative == sorted(cumulative, reverse=True)
+    # Sort order and number of functions
+    with pmisc.Profile(top=2, sort="total") as pobj:
+        for _ in range(3):
+            _leaf()
+    lines = pobj.report().splitlines()
+    assert len(lines) == 3
+    assert float(lines[1].split()[-2]) >= float(lines[2].split()[-2])
+    # Path filter
+    pkg_dir = os.path.dirname(pmisc.isnumber.__code__.co_filename)
+    with pmisc.Profile(paths=[pkg_dir]) as pobj:
+        _leaf()
+        pmisc.isnumber(5)
+    labels = [line.split()[0] for line in pobj.report().splitlines()[1:]]
+    assert "isnumber" in labels
+    assert "_leaf" not in labels
+    assert "<built-in" not in labels
+    # Dump and print
+    with pmisc.TmpFile() as fname:
+        with pmisc.Profile(fname=fname, verbose=True):
+            _leaf()
+        assert any(func[2] == "_leaf" for func in pstats.Stats(fname).stats)
+    out, _ = capsys.readouterr()
+    assert out.startswith("Function ")
+    # Exceptions are not trapped
+    with pytest.raises(ValueError):
+        with pmisc.Profile():
+            raise ValueError("Error")
+    # Nested profiles are rejected, the active profile keeps running
+    with pmisc.Profile(sort="total") as pobj:
+        with pytest.raises(RuntimeError) as excinfo:
+            with pmisc.Profile():
+                pass
+        assert get_exmsg(excinfo) == "Another profile is active"
+        for _ in range(100):
+            _leaf()
+    calls = [
+        values[1] for func, values in pobj.stats.stats.items() if func[2] == "_leaf"
+    ]
+    assert calls == [100]
+    with pmisc.Profile():
+        pass
+
+
+@pytest.mark.parametrize(
+    "args, arg",
+    [
+        (dict(top=0), "top"),
+        (dict(sort="calls"), "sort"),
+        (dict(paths=5), "paths"),
+        (dict(paths=[]), "paths"),
+        (dict(paths=["a", ""]), "paths"),
+        (dict(fname=""), "fname"),
+        (dict(verbose=1), "verbose"),
+    ],
+)
+def test_profile_exceptions(args, arg):
+    """Test Profile exceptions."""
+    exmsg = "Argument `{0}` is not valid".format(arg)
+    AE(pmisc.Profile, RuntimeError, exmsg, **args)
+
+
+def test_sample_profiler():
+    """Test SampleProfiler context manager behavior."""
+    assert pmisc.SampleProfiler().samples == 0
+    with pmisc.SampleProfiler(interval=0.001) as pobj:
+        _spin(pobj, 20)
+    assert not any(
+        thread.name == "pmisc-SampleProfiler" for thread in threading.enumerate()
+    )
+    lines = pobj.collapsed().splitlines()
+    stacks = dict(line.rsplit(" ", 1) for line in lines)
+    assert sum(int(count) for count in stacks.values()) == pobj.samples >= 20
+    frames = max(stacks, key=lambda stack: int(stacks[stack])).split(";")
+    assert frames[-1].startswith("_leaf (" + __file__.rstrip("c") + ":")
+    assert frames[-2].startswith("_spin (")
+    assert frames[-3].startswith("test_sample_profiler (")
+    assert not any("pmisc-SampleProfiler" in line for line in lines)
+    report = pobj.report(top=2).splitlines()
+    assert report[0].split() == ["Function", "self", "self%", "total", "total%"]
+    assert len(report) <= 3
+    assert report[1].startswith("_leaf (")
+    assert float(report[1].split()[-3]) > 50
+    # Depth limit
+    with pmisc.SampleProfiler(interval=0.001, max_depth=2) as pobj:
+        _spin(pobj, 5)
+    assert all(
+        len(line.rsplit(" ", 1)[0].split(";")) <= 2
+        for line in pobj.collapsed().splitlines()
+    )
+    # All threads
+    stop = threading.Event()
+    thread = threading.Thread(target=stop.wait, name="waiter")
+    thread.start()
+    try:
+        with pmisc.SampleProfiler(interval=0.001, all_threads=True) as pobj:
+            _spin(pobj, 5)
+    finally:
+        stop.set()
+        thread.join()
+    roots = set(line.split(";", 1)[0] for line in pobj.collapsed().splitlines())
+    assert {"waiter", threading.current_thread().name} <= roots
+    # Exceptions are not trapped
+    with pytest.raises(ValueError):
+        with pmisc.SampleProfiler():
+            time.sleep(0.01)
+            raise ValueError("Error")
+
+
+@pytest.mark.parametrize(
+    "args, arg",
+    [
+        (dict(interval=0), "interval"),
+        (dict(interval=True), "interval"),
+        (dict(all_threads=1), "all_threads"),
+        (dict(max_depth=0), "max_depth"),
+        (dict(max_depth=1.5), "max_depth"),
+    ],
+)
+def test_sample_profiler_exceptions(args, arg):
+    """Test SampleProfiler exceptions."""
+    exmsg = "Argument `{0}` is not valid".format(arg)
+    AE(pmisc.SampleProfiler, RuntimeError, exmsg, **args)
+    pobj = pmisc.SampleProfiler()
+    AE(pobj.report, RuntimeError, "Argument `top` is not valid", top=0)
+
+
+def test_resource_usage():
+    """Test ResourceUsage context manager behavior."""
+    names = [
+        "block_inputs",
+        "block_outputs",
+        "involuntary_switches",
+        "major_faults",
+        "max_rss",
+        "minor_faults",
+        "system_time",
+        "user_time",
+        "voluntary_switches",
+    ]
+    robj = pmisc.ResourceUsage()
+    assert all(getattr(robj, name) is None for name in names)
+    with robj:
+        data = bytearray(16 * 1024 * 1024)
+        for num in range(0, len(data), 4096):
+            data[num] = 1
+        time.sleep(0.01)
+    assert robj.minor_faults >= 1000
+    assert robj.voluntary_switches >= 1
+    assert robj.max_rss >= len(data)
+    assert all(isinstance(getattr(robj, name), int) for name in names[:6])
+    assert all(isinstance(getattr(robj, name), float) for name in names[6:8])
+    assert all(getattr(robj, name) >= 0 for name in names)
+    # Thread scope, time used by other threads is not counted
+    thread = threading.Thread(target=lambda: sum(range(5000000)))
+    with pmisc.ResourceUsage(scope="thread") as tobj:
+        with pmisc.ResourceUsage(scope="process") as pobj:
+            thread.start()
+            thread.join()
+    assert tobj.user_time < pobj.user_time
+    # Exceptions are not trapped
+    with pytest.raises(ValueError):
+        with pmisc.ResourceUsage():
+            raise ValueError("Error")
+
+
+def test_resource_usage_exceptions():
+    """Test ResourceUsage exceptions."""
+    exmsg = "Argument `scope` is not valid"
+    AE(pmisc.ResourceUsage, RuntimeError, exmsg, scope="cluster")
+    AE(pmisc.ResourceUsage, RuntimeError, exmsg, scope=5)
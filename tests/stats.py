@@ -0,0 +1,236 @@
+# stats.py
+# Copyright (c) 2013-2020 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111,W0212
+
+# Standard library imports
+import pickle
+import random
+import threading
+import zlib
+
+# PyPI imports
+import pytest
+
+# Intra-package imports
+import pmisc
+from pmisc.test import assert_arg_invalid as AI
+from pmisc.test import get_exmsg
+
+
+###
+# Test functions
+###
+def test_timer_registry():
+    """Test TimerRegistry class behavior."""
+    with pytest.raises(RuntimeError) as excinfo:
+        pmisc.Timer(name=5)
+    assert get_exmsg(excinfo) == "Argument `name` is not valid"
+    with pytest.raises(RuntimeError) as excinfo:
+        pmisc.Timer(name="")
+    assert get_exmsg(excinfo) == "Argument `name` is not valid"
+    assert isinstance(pmisc.timer_registry(), pmisc.TimerRegistry)
+    assert pmisc.timer_registry() is pmisc.timer_registry()
+    registry = pmisc.TimerRegistry()
+    for _ in range(10):
+        with pmisc.Timer(name="request", registry=registry) as tobj:
+            assert tobj.name == "request"
+            with pmisc.Timer(name="db.query", registry=registry):
+                pass
+            with pmisc.Timer(name="db.query", registry=registry):
+                pass
+        with pmisc.Timer(name="db.query", registry=registry):
+            pass
+    stats = registry.stats()
+    assert sorted(stats) == [("db.query",), ("request",), ("request", "db.query")]
+    assert stats[("request",)]["count"] == 10
+    assert stats[("request", "db.query")]["count"] == 20
+    assert stats[("db.query",)]["count"] == 10
+    node = stats[("request",)]
+    assert node["min"] <= node["p50"] <= node["p95"] <= node["p99"] <= node["max"]
+    assert node["mean"] == node["total"] / 10.0
+    lines = registry.report().splitlines()
+    assert lines[0].split() == [
+        "Name",
+        "count",
+        "total",
+        "mean",
+        "min",
+        "max",
+        "p50",
+        "p95",
+        "p99",
+    ]
+    assert [line.split()[:2] for line in lines[1:]] == [
+        ["db.query", "10"],
+        ["request", "10"],
+        ["db.query", "20"],
+    ]
+    assert lines[2].startswith("request ")
+    assert lines[3].startswith("  db.query ")
+    registry.reset()
+    assert registry.stats() == {}
+    # Test weighted measurements
+    registry.record(("weighted",), 100, 4)
+    registry.record(("weighted",), 200, 4)
+    node = registry.stats()[("weighted",)]
+    assert (node["count"], node["total"], node["mean"]) == (8, 1200, 150)
+    registry.reset()
+    # Test percentiles
+    rng = random.Random(1234)
+    data = [rng.randint(1000, 10 ** 7) for _ in range(20000)]
+    for value in data:
+        registry.record(("random",), value)
+    node = registry.stats()[("random",)]
+    assert (node["min"], node["max"]) == (min(data), max(data))
+    for prob in [50, 95, 99]:
+        ref = sorted(data)[int(prob * len(data) / 100) - 1]
+        assert abs(node["p{0}".format(prob)] - ref) <= 0.01 * ref
+    registry.reset()
+    # Test that exceptions do not corrupt the call tree
+    with pytest.raises(RuntimeError):
+        with pmisc.Timer(name="outer", registry=registry):
+            raise RuntimeError("Error in code")
+    with pmisc.Timer(name="next", registry=registry):
+        pass
+    assert sorted(registry.stats()) == [("next",), ("outer",)]
+
+
+def test_timer_registry_threads():  # noqa: D202
+    """Test TimerRegistry class behavior with concurrent threads."""
+
+    def worker(name):
+        with pmisc.Timer(name=name, registry=registry):
+            barrier.wait()
+            for _ in range(100):
+                with pmisc.Timer(name="inner", registry=registry):
+                    pass
+
+    registry = pmisc.TimerRegistry()
+    barrier = threading.Barrier(4)
+    threads = [
+        threading.Thread(target=worker, args=("thread{0}".format(num),))
+        for num in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = registry.stats()
+    assert sorted(stats) == sorted(
+        [("thread{0}".format(num),) for num in range(4)]
+        + [("thread{0}".format(num), "inner") for num in range(4)]
+    )
+    assert all(stats[path]["count"] == 100 for path in stats if len(path) == 2)
+
+
+def test_histogram():
+    """Test Histogram class behavior."""
+    AI(pmisc.Histogram, "precision", precision=0)
+    AI(pmisc.Histogram, "precision", precision=6)
+    AI(pmisc.Histogram, "precision", precision=True)
+    AI(pmisc.Histogram, "max_value", max_value=1)
+    AI(pmisc.Histogram, "max_value", max_value=1.5)
+    obj = pmisc.Histogram()
+    AI(obj.percentile, "prob", prob=-1)
+    AI(obj.percentile, "prob", prob=101)
+    AI(obj.percentile, "prob", prob="a")
+    assert (obj.count, obj.min, obj.max, obj.mean) == (0, None, None, None)
+    assert obj.percentile(50) is None
+    # Bucket boundaries
+    obj = pmisc.Histogram(precision=3, max_value=10 ** 12)
+    for value in range(100000):
+        index = obj._index(value)
+        assert obj._value(index) >= value
+        assert obj._index(obj._value(index)) == index
+    # Accuracy
+    rng = random.Random(1234)
+    data = [rng.randint(1, 10 ** 10) for _ in range(20000)]
+    for value in data:
+        obj.record(value)
+    data.sort()
+    for prob in [0, 10, 50, 90, 99, 99.9, 100]:
+        ref = data[max(0, int(-(-prob * len(data) // 100)) - 1)]
+        assert abs(obj.percentile(prob) - ref) <= 1e-3 * ref
+    assert obj.count == len(data)
+    assert (obj.min, obj.max) == (data[0], data[-1])
+    assert obj.mean == sum(data) / float(len(data))
+    # Clamping
+    obj = pmisc.Histogram(max_value=1000)
+    obj.record(-5)
+    obj.record(10 ** 6, count=3)
+    assert (obj.count, obj.min, obj.max) == (4, 0, 1000)
+    assert obj.percentile(50) == 1000
+    obj.reset()
+    assert (obj.count, obj.min, obj.max, obj.percentile(50)) == (0, None, None, None)
+
+
+def test_histogram_merge():  # noqa: D202
+    """Test Histogram class merging and serialization behavior."""
+
+    def worker(values):
+        hist = pmisc.Histogram()
+        for value in values:
+            hist.record(value)
+        return hist
+
+    obj = pmisc.Histogram()
+    AI(obj.merge, "other", other=5)
+    AI(obj.merge, "other", other=pmisc.Histogram(precision=3))
+    AI(obj.merge, "other", other=pmisc.Histogram(max_value=10))
+    obj.merge(pmisc.Histogram())
+    assert obj.count == 0
+    # Concurrent recording in a shared histogram and merging
+    threads = [
+        threading.Thread(target=lambda: [obj.record(value) for value in range(1000)])
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert obj.count == 4000
+    ref = worker(list(range(1000)) * 4)
+    assert obj._counts == ref._counts
+    merged = worker(range(500))
+    merged.merge(worker(range(500, 1000)))
+    merged.merge(worker([]))
+    assert merged._counts == worker(range(1000))._counts
+    assert (merged.count, merged.min, merged.max) == (1000, 0, 999)
+    # Serialization
+    for copy in [
+        pmisc.Histogram.from_bytes(obj.to_bytes()),
+        pickle.loads(pickle.dumps(obj)),
+    ]:
+        assert copy._counts == obj._counts
+        assert (copy.count, copy.min, copy.max, copy.mean) == (
+            obj.count,
+            obj.min,
+            obj.max,
+            obj.mean,
+        )
+        copy.record(5)
+        assert copy.count == obj.count + 1
+    empty = pmisc.Histogram.from_bytes(pmisc.Histogram().to_bytes())
+    assert (empty.count, empty.min, empty.max) == (0, None, None)
+    assert len(obj.to_bytes()) < 8 * len(obj._counts) / 10
+    data = obj.to_bytes()
+    for item in [b"", b"XXXX" + data[4:], data[:-5], 5]:
+        AI(pmisc.Histogram.from_bytes, "data", data=item)
+    AI(
+        pmisc.Histogram.from_bytes,
+        "data",
+        data=data[: pmisc.Histogram._HEADER.size] + zlib.compress(b"\0" * 8),
+    )
+
+
+def test_timer_histogram():
+    """Test Timer class feeding a histogram."""
+    AI(pmisc.Timer, "histogram", histogram=5)
+    hist = pmisc.Histogram()
+    tobj = pmisc.Timer(histogram=hist)
+    for _ in range(10):
+        with tobj:
+            pass
+    assert hist.count == 10
+    assert (hist.min, hist.max) == (min(tobj.laps), max(tobj.laps))
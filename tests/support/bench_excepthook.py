@@ -0,0 +1,66 @@
+# bench_excepthook.py
+# Copyright (c) 2013-2020 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111,W0212
+"""Measure the pmisc.test exception hook over deep synthetic tracebacks."""
+
+# Standard library imports
+from __future__ import print_function
+import sys
+import timeit
+import traceback
+
+# Intra-package imports
+import pmisc
+import pmisc.test
+
+
+def recurse(depth):
+    if depth:
+        recurse(depth - 1)
+    else:
+        pmisc.compare_strings("a", "b")
+
+
+def deep_traceback(depth):
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(depth + 1000)
+    try:
+        recurse(depth)
+    except AssertionError:
+        return sys.exc_info()
+    finally:
+        sys.setrecursionlimit(limit)
+    raise RuntimeError("Exception not raised")
+
+
+def main(depth=10000, number=20):
+    exc_type, exc_value, exc_tb = deep_traceback(depth)
+    tbs = traceback.extract_tb(exc_tb)
+    print("Traceback depth: {0} frames".format(len(tbs)))
+    obj = pmisc.test._find_test_module_frame
+    tval = min(timeit.repeat(lambda: obj(tbs), number=number, repeat=5)) / number
+    print(
+        "_find_test_module_frame: {0:8.3f} ms ({1:.1f} ns/frame)".format(
+            1000.0 * tval, 1e9 * tval / len(tbs)
+        )
+    )
+    eprint, pmisc.test._eprint = pmisc.test._eprint, lambda msg: None
+    try:
+        tval = (
+            min(
+                timeit.repeat(
+                    lambda: pmisc._excepthook(exc_type, exc_value, exc_tb),
+                    number=number,
+                    repeat=5,
+                )
+            )
+            / number
+        )
+    finally:
+        pmisc.test._eprint = eprint
+    print("_excepthook:             {0:8.3f} ms".format(1000.0 * tval))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
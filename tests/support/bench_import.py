@@ -0,0 +1,44 @@
+# bench_import.py
+# Copyright (c) 2013-2020 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111
+"""Measure the interpreter start-up cost of importing pmisc."""
+
+# Standard library imports
+from __future__ import print_function
+import statistics
+import subprocess
+import sys
+import time
+
+STMTS = [
+    ("import pmisc", "import pmisc"),
+    ("import pmisc; pmisc.CiDict", "import pmisc; pmisc.CiDict"),
+    ("import pmisc; pmisc.Timer", "import pmisc; pmisc.Timer"),
+    ("import pmisc; pmisc.compare_strings", "import pmisc; pmisc.compare_strings"),
+]
+
+
+def measure(stmt, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.check_call([sys.executable, "-c", stmt])
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main(repeat=21):
+    base = measure("pass", repeat)
+    print("{0:<40} {1:8.1f} ms".format("bare interpreter", 1000.0 * base))
+    for label, stmt in STMTS:
+        tval = measure(stmt, repeat)
+        print(
+            "{0:<40} {1:8.1f} ms (+{2:.1f} ms over bare interpreter)".format(
+                label, 1000.0 * tval, 1000.0 * (tval - base)
+            )
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 21)
@@ -0,0 +1,53 @@
+# bench_template.py
+# Copyright (c) 2013-2020 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111
+"""Compare shutil.copytree and pmisc.TmpDir template population strategies."""
+
+# Standard library imports
+from __future__ import print_function
+import os
+import shutil
+import sys
+import timeit
+
+# Intra-package imports
+import pmisc
+
+
+def make_template(dname, dirs, files, size):
+    data = os.urandom(size)
+    for dnum in range(dirs):
+        sdir = os.path.join(dname, "dir{0}".format(dnum))
+        os.mkdir(sdir)
+        for fnum in range(files):
+            with open(os.path.join(sdir, "file{0}".format(fnum)), "wb") as fobj:
+                fobj.write(data)
+
+
+def main(number=5, dirs=10, files=50, size=65536):
+    def with_copytree():
+        with pmisc.TmpDir() as dname:
+            shutil.copytree(template, os.path.join(dname, "tree"), symlinks=True)
+
+    def with_template(strategy):
+        with pmisc.TmpDir(template=template, strategy=strategy):
+            pass
+
+    with pmisc.TmpDir() as template:
+        make_template(template, dirs, files, size)
+        print("{0} files of {1} bytes".format(dirs * files, size))
+        for name, obj in [("copytree", with_copytree)] + [
+            (strategy, lambda strategy=strategy: with_template(strategy))
+            for strategy in ["copy", "reflink", "hardlink"]
+        ]:
+            tval = min(timeit.repeat(obj, number=number, repeat=3)) / number
+            print("{0:<10} {1:8.2f} ms".format(name, 1e3 * tval))
+        for strategy in ["copy", "reflink", "hardlink"]:
+            obj = pmisc.TmpDir(template=template, strategy=strategy)
+            with obj:
+                print("{0:<10} used {1}".format(strategy, obj.strategy))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
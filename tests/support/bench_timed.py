@@ -0,0 +1,51 @@
+# bench_timed.py
+# Copyright (c) 2013-2020 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111
+"""Measure the per-call overhead of the pmisc.timed decorator."""
+
+# Standard library imports
+from __future__ import print_function
+import sys
+import timeit
+
+# Intra-package imports
+import pmisc
+
+REGISTRY = pmisc.TimerRegistry()
+
+
+def func():
+    pass
+
+
+def with_timer():
+    with pmisc.Timer(name="timer", registry=REGISTRY):
+        pass
+
+
+def measure(obj, number):
+    return min(timeit.repeat(obj, number=number, repeat=5)) / number
+
+
+def main(number=200000):
+    base = measure(func, number)
+    print("Undecorated call:          {0:8.1f} ns".format(1e9 * base))
+    tval = measure(with_timer, number)
+    print(
+        "Timer context manager:     {0:8.1f} ns (+{1:.1f} ns)".format(
+            1e9 * tval, 1e9 * (tval - base)
+        )
+    )
+    for sample in [1, 1 / 10.0, 1 / 100.0, 1 / 1000.0]:
+        obj = pmisc.timed("timed", sample=sample, registry=REGISTRY)(func)
+        tval = measure(obj, number)
+        print(
+            "timed(sample=1/{0:<4}):     {1:8.1f} ns (+{2:.1f} ns)".format(
+                int(round(1 / sample)), 1e9 * tval, 1e9 * (tval - base)
+            )
+        )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
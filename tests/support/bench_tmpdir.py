@@ -0,0 +1,41 @@
+# bench_tmpdir.py
+# Copyright (c) 2013-2020 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111
+"""Compare pmisc.TmpDir and pmisc.TmpDirPool per-use cost."""
+
+# Standard library imports
+from __future__ import print_function
+import os
+import sys
+import timeit
+
+# Intra-package imports
+import pmisc
+
+
+def populate(dname, files):
+    for num in range(files):
+        with open(os.path.join(dname, "file{0}".format(num)), "w") as fobj:
+            fobj.write("data")
+
+
+def main(number=2000, files=5):
+    def with_tmpdir():
+        with pmisc.TmpDir() as dname:
+            populate(dname, files)
+
+    def with_pool():
+        with pool.tmpdir() as dname:
+            populate(dname, files)
+
+    pool = pmisc.TmpDirPool()
+    print("{0} files per directory".format(files))
+    for name, obj in [("TmpDir", with_tmpdir), ("TmpDirPool", with_pool)]:
+        tval = min(timeit.repeat(obj, number=number, repeat=5)) / number
+        print("{0:<12} {1:8.1f} us/use".format(name, 1e6 * tval))
+    pool.close()
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,40 @@
+# bench_tmpfiles.py
+# Copyright (c) 2013-2020 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111
+"""Compare pmisc.TmpFile and pmisc.TmpFiles cost for a batch of files."""
+
+# Standard library imports
+from __future__ import print_function
+import contextlib
+import sys
+import timeit
+
+# Intra-package imports
+import pmisc
+
+
+def main(number=20, files=200, size=4096):
+    data = "x" * size
+
+    def with_tmpfile():
+        with contextlib.ExitStack() as stack:
+            for _ in range(files):
+                stack.enter_context(pmisc.TmpFile(contents=data))
+
+    def with_tmpfiles(workers):
+        with pmisc.TmpFiles([data] * files, workers=workers):
+            pass
+
+    print("{0} files of {1} bytes".format(files, size))
+    for name, obj in [
+        ("TmpFile", with_tmpfile),
+        ("TmpFiles", lambda: with_tmpfiles(1)),
+        ("TmpFiles(4)", lambda: with_tmpfiles(4)),
+    ]:
+        tval = min(timeit.repeat(obj, number=number, repeat=5)) / number
+        print("{0:<12} {1:8.2f} ms/batch".format(name, 1e3 * tval))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
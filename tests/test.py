@@ -499,3 +499,59 @@ def test_del_pmisc_test_frames():
         excinfo.traceback[-1]
     )
     assert get_last_tb(excinfo.traceback[-1]._rawentry).tb_lineno == line3
+
+
+def test_exc_traps():
+    """Test exception traps are resolved without reading the module source."""
+    # pylint: disable=C0415
+    # Imported here so as to not shift line numbers hard-coded in tests above
+    import glob
+    import linecache
+    import py_compile
+    import subprocess
+    import zipfile
+
+    fname = pmisc.test.__file__
+    for _, _, lnum, func, exc in _EXC_TRAPS:
+        assert linecache.getline(fname, lnum).strip() == exc.strip(), func
+    # Package installed as a zip file with byte-compiled files only
+    with pmisc.TmpDir() as dname:
+        zname = os.path.join(dname, "pmisc.zip")
+        with zipfile.ZipFile(zname, "w") as zobj:
+            for sname in glob.glob(os.path.join(os.path.dirname(fname), "*.py")):
+                cname = os.path.join(dname, "tmp.pyc")
+                py_compile.compile(sname, cfile=cname, doraise=True)
+                arcname = "pmisc/" + os.path.basename(sname) + "c"
+                zobj.write(cname, arcname)
+        cmd = (
+            "import sys; sys.path.insert(0, {0!r}); import pmisc.test; "
+            "print(pmisc.test.__file__); "
+            "print([item[2] for item in pmisc.test._EXC_TRAPS])"
+        ).format(zname)
+        out = subprocess.check_output([sys.executable, "-c", cmd], cwd=dname)
+    out = out.decode().split("\n")
+    assert out[0].endswith(".pyc")
+    assert out[1] == str([item[2] for item in _EXC_TRAPS])
+
+
+def test_find_test_module_frame():  # noqa: D202
+    """Test _find_test_module_frame function behavior with deep tracebacks."""
+
+    def recurse(depth):
+        if depth:
+            recurse(depth - 1)
+        else:
+            pmisc.compare_strings("a", "b")
+
+    obj = pmisc.test._find_test_module_frame
+    with pytest.raises(AssertionError) as excinfo:
+        recurse(500)
+    tbs = list(pmisc.test._walk_tb(excinfo.tb))
+    assert obj(tbs) == len(tbs) - 1
+    assert tbs[-1][2] == "compare_strings"
+    assert obj(tbs[:-1]) == 0
+    fname, line, func = tbs[-1]
+    assert obj([tbs[0], (fname, line, func)]) == 1
+    other = fname.replace(os.sep + "pmisc" + os.sep, os.sep + "xpmisc" + os.sep)
+    assert obj([tbs[0], (other, line, func)]) == 0
+    assert obj([tbs[0], (fname, line + 1, func)]) == 0
@@ -4,12 +4,18 @@
 # pylint: disable=C0111,W0401,W0614
 
 # Intra-package imports
+from .benchmark import *
 from .ctx import *
 from .dicts import *
+from .export import *
 from .file import *
+from .init import *
 from .member import *
 from .misc import *
 from .number import *
+from .prof import *
 from .rst import *
+from .stats import *
 from .strings import *
 from .test import *
+from .tracing import *
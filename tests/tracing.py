@@ -0,0 +1,171 @@
+# tracing.py
+# Copyright (c) 2013-2020 Pablo Acosta-Serafini
+# See LICENSE for details
+# pylint: disable=C0111
+
+# Standard library imports
+import asyncio
+import json
+import os
+import threading
+import time
+
+# PyPI imports
+import pytest
+
+# Intra-package imports
+import pmisc
+from pmisc.test import assert_exception as AE
+from pmisc.test import get_exmsg
+from .ctx import _run
+
+
+###
+# Helper functions
+###
+def _lap(name):
+    with pmisc.Timer(name=name):
+        pass
+
+
+def _pairs(events):
+    return [(event["name"], event["ph"]) for event in events if event["ph"] != "M"]
+
+
+###
+# Test functions
+###
+def test_trace_recorder():
+    """Test TraceRecorder class behavior."""
+    rec = pmisc.TraceRecorder()
+    with pmisc.Timer(name="before"):
+        pass
+    assert rec.events == []
+    with rec:
+        with pmisc.Timer(name="outer"):
+            with pmisc.Timer():
+                with pmisc.Timer(name="inner"):
+                    rec.begin("custom", value=5)
+                    rec.end("custom")
+        thread = threading.Thread(target=_lap, args=("thread",))
+        thread.start()
+        thread.join()
+    with pmisc.Timer(name="after"):
+        pass
+    events = rec.events
+    assert _pairs(events) == [
+        ("outer", "B"),
+        ("inner", "B"),
+        ("custom", "B"),
+        ("custom", "E"),
+        ("inner", "E"),
+        ("outer", "E"),
+        ("thread", "B"),
+        ("thread", "E"),
+    ]
+    assert events[1]["args"] == {"path": "outer/inner"}
+    assert events[2]["args"] == {"value": 5}
+    assert "args" not in events[3]
+    assert all(event["pid"] == os.getpid() for event in events)
+    assert events[0]["ts"] <= events[1]["ts"] <= events[4]["ts"] <= events[5]["ts"]
+    assert events[0]["tid"] != events[6]["tid"]
+    metadata = [event for event in events if event["ph"] == "M"]
+    assert len(metadata) == 2
+    assert {event["tid"] for event in metadata} == {
+        events[0]["tid"],
+        events[6]["tid"],
+    }
+    assert {event["args"]["name"] for event in metadata} == {
+        threading.current_thread().name,
+        thread.name,
+    }
+    # Only one active recorder
+    with rec:
+        with pytest.raises(RuntimeError) as excinfo:
+            pmisc.TraceRecorder().start()
+        assert get_exmsg(excinfo) == "Another trace recorder is active"
+    # Ring buffer
+    rec = pmisc.TraceRecorder(maxsize=4)
+    with rec:
+        for num in range(3):
+            _lap("lap{0}".format(num))
+    assert rec.dropped == 2
+    assert _pairs(rec.events) == [
+        ("lap1", "B"),
+        ("lap1", "E"),
+        ("lap2", "B"),
+        ("lap2", "E"),
+    ]
+
+
+def test_trace_recorder_async():  # noqa: D202
+    """Test TraceRecorder with asynchronous timers."""
+
+    async def task(name):
+        async with pmisc.Timer(name=name):
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(task("task1"), task("task2"))
+
+    with pmisc.TraceRecorder() as rec:
+        _run(main())
+    events = [event for event in rec.events if event["ph"] != "M"]
+    assert sorted(_pairs(events)) == [
+        ("task1", "b"),
+        ("task1", "e"),
+        ("task2", "b"),
+        ("task2", "e"),
+    ]
+    ids = dict(((event["name"], event["ph"]), event["id"]) for event in events)
+    assert ids[("task1", "b")] == ids[("task1", "e")]
+    assert ids[("task2", "b")] == ids[("task2", "e")]
+    assert ids[("task1", "b")] != ids[("task2", "b")]
+
+
+def test_trace_recorder_files():
+    """Test TraceRecorder streaming and dump files."""
+    with pmisc.TmpFile() as fname:
+        rec = pmisc.TraceRecorder(fname, maxsize=10, interval=0.01)
+        with rec:
+            for num in range(20):
+                _lap("lap")
+                if num % 4 == 3:
+                    time.sleep(0.05)
+        with open(fname) as fobj:
+            events = json.load(fobj)
+        assert rec.dropped == 0
+        assert _pairs(events) == 20 * [("lap", "B"), ("lap", "E")]
+        assert events[-1]["ph"] == "M"
+        assert rec.events == events[-1:]
+        # No events
+        with pmisc.TraceRecorder(fname):
+            pass
+        with open(fname) as fobj:
+            assert json.load(fobj) == []
+        # Dump
+        rec = pmisc.TraceRecorder()
+        with rec:
+            _lap("lap")
+        rec.dump(fname)
+        with open(fname) as fobj:
+            data = json.load(fobj)
+        assert data["displayTimeUnit"] == "ns"
+        assert data["traceEvents"] == rec.events
+
+
+@pytest.mark.parametrize(
+    "args, arg",
+    [
+        (dict(fname=5), "fname"),
+        (dict(fname=""), "fname"),
+        (dict(maxsize=0), "maxsize"),
+        (dict(maxsize=True), "maxsize"),
+        (dict(interval=0), "interval"),
+        (dict(interval="a"), "interval"),
+    ],
+)
+def test_trace_recorder_exceptions(args, arg):
+    """Test TraceRecorder exceptions."""
+    exmsg = "Argument `{0}` is not valid".format(arg)
+    AE(pmisc.TraceRecorder, RuntimeError, exmsg, **args)